@@ -0,0 +1,280 @@
+# ai.py
+
+# A computer player for Mad Rooks.
+# It searches the bitboard representation from bitboard.py with negamax and
+# 	alpha-beta pruning, deepening one ply at a time until its time budget
+# 	runs out, and always answers with the best move of the deepest search
+# 	that finished.
+
+import gc
+from time import perf_counter
+
+import rules
+from movegen import generate, legal_destinations, sides, encode_move, decode_move
+from bitboard import squares, hits
+from ttable import TranspositionTable, EXACT, LOWER, UPPER
+import zobrist
+
+# Scores are from the point of view of the player to move. A win is worth
+# 	more than any material difference, and winning sooner is worth more.
+WIN = 100000
+PIECE_VALUE = 100
+
+# The search stops this share of its time budget early, but never more than
+# 	MAX_MARGIN seconds, to leave time for unwinding and returning the move.
+MARGIN = 0.05
+MAX_MARGIN = 0.01
+
+
+# Raised inside the search when the time budget is used up.
+class SearchTimeout(Exception):
+	pass
+
+
+# Score a position by the difference in the number of pieces.
+def evaluate(own, enemy):
+	return (own.bit_count() - enemy.bit_count()) * PIECE_VALUE
+
+
+# List the legal moves with the killing moves first. Since a piece that can
+# 	kill must kill (can_kill), these are also the most forcing ones.
+# best is a move to try before all others, such as the one that was best in
+# 	the previous iteration.
+def ordered_moves(own, enemy, best=None):
+	kills = []
+	quiet = []
+	found_best = False
+	for move in generate(own, enemy):
+		if move == best:
+			found_best = True
+		elif enemy >> move[1] & 1:
+			kills.append(move)
+		else:
+			quiet.append(move)
+
+	if found_best:
+		return [best] + kills + quiet
+	return kills + quiet
+
+
+# Make a move on a pair of bitboards.
+# Returns the (own, enemy) pair for the player who moves next.
+def make_move(own, enemy, move):
+	start, end = move
+	end_bit = 1 << end
+	return enemy & ~end_bit, own ^ (1 << start) | end_bit
+
+
+# Win scores depend on the distance from the root, so they are stored in the
+# 	transposition table as the distance from the position instead.
+def to_table(score, ply):
+	if score > WIN - 1000: return score + ply
+	if score < -WIN + 1000: return score - ply
+	return score
+
+
+# Undo to_table for a position ply moves from the root.
+def from_table(score, ply):
+	if score > WIN - 1000: return score - ply
+	if score < -WIN + 1000: return score + ply
+	return score
+
+
+class Searcher():
+
+	# table is the TranspositionTable to consult, which can be shared between
+	# 	searchers; by default each gets its own of table_mb megabytes.
+	# book is a book.OpeningBook whose moves are played without searching
+	# 	while the game is still in it, or None.
+	def __init__(self, time_limit=1.0, max_depth=64, table=None, table_mb=16, book=None):
+		self.time_limit = time_limit
+		self.max_depth = max_depth
+		self.table = TranspositionTable(table_mb) if table is None else table
+		self.book = book
+
+		# Statistics about the last search, for tuning.
+		self.nodes = 0
+		self.depth = 0
+		self.score = 0
+		self.elapsed = 0.0
+
+	# Find the best move for the player with the pieces in own.
+	# color is that player's rules color, which the position hashes need.
+	# Returns a (start, end) pair of board indexes, or None if there are no
+	# 	legal moves.
+	def search(self, own, enemy, color=rules.RED):
+		start_time = perf_counter()
+		self.deadline = start_time + self.time_limit - min(self.time_limit * MARGIN, MAX_MARGIN)
+		self.nodes = 0
+		self.depth = 0
+		self.score = 0
+		self.table.new_search()
+
+		if color == rules.RED:
+			key = zobrist.hash_bits(own, enemy, True)
+		else:
+			key = zobrist.hash_bits(enemy, own, False)
+
+		# A book move only has to be checked, in case of a hash collision.
+		if self.book is not None:
+			move = self.book.choose(key)
+			if move is not None and own >> move[0] & 1 and legal_destinations(move[0], own, enemy) >> move[1] & 1:
+				self.elapsed = perf_counter() - start_time
+				return move
+
+		moves = ordered_moves(own, enemy)
+		best = moves[0] if moves else None
+
+		# The search makes no reference cycles, and a full collection in the
+		# 	middle of it could take longer than a small budget.
+		collecting = gc.isenabled()
+		gc.disable()
+		try:
+			for depth in range(1, self.max_depth + 1):
+				score, move = self.root(own, enemy, depth, best, key, color)
+				best = move
+				self.depth = depth
+				self.score = score
+
+				# Stop once the game is decided, or when the next iteration
+				# 	is unlikely to finish in the time left.
+				if abs(score) >= WIN - self.max_depth:
+					break
+				if perf_counter() - start_time > self.time_limit / 2:
+					break
+
+		except SearchTimeout:
+			pass
+		finally:
+			if collecting:
+				gc.enable()
+
+		self.elapsed = perf_counter() - start_time
+		return best
+
+	# Search every root move to the given depth, trying best first.
+	def root(self, own, enemy, depth, best, key, color):
+		alpha = -WIN - 1
+		best_move = None
+		for move in ordered_moves(own, enemy, best):
+			if perf_counter() > self.deadline:
+				raise SearchTimeout
+			child_key = zobrist.update(key, color, move[0], move[1], enemy >> move[1] & 1)
+			score = -self.negamax(
+				*make_move(own, enemy, move), depth - 1, -WIN - 1, -alpha, 1,
+				child_key, rules.opponent(color)
+			)
+			if best_move is None or score > alpha:
+				alpha = score
+				best_move = move
+		return alpha, best_move
+
+	# Score the position for the player with the pieces in own, searching
+	# 	depth more moves ahead within the (alpha, beta) window.
+	# ply is the distance from the root, so that quicker wins score higher.
+	# key is the Zobrist hash of the position and color the rules color of
+	# 	the player to move.
+	def negamax(self, own, enemy, depth, alpha, beta, ply, key, color):
+		# A node costs far more than reading the clock, especially on large
+		# 	boards, so the clock is read at every one.
+		self.nodes += 1
+		if perf_counter() > self.deadline:
+			raise SearchTimeout
+
+		# The previous move took the last enemy piece.
+		if not own:
+			return -(WIN - ply)
+
+		if depth == 0:
+			return evaluate(own, enemy)
+
+		if depth == 1:
+			score = self.frontier(own, enemy, ply)
+			if score is not None:
+				return score
+
+		# A stored result is good enough if it came from at least as deep a
+		# 	search and its bound settles this window. Otherwise its best move
+		# 	is still the one to try first.
+		best = None
+		entry = self.table.probe(key)
+		if entry is not None:
+			entry_depth, flag, score, move = entry
+			score = from_table(score, ply)
+			if entry_depth >= depth and (
+				flag == EXACT
+				or (flag == LOWER and score >= beta)
+				or (flag == UPPER and score <= alpha)
+			):
+				return score
+			if move:
+				best = decode_move(move)
+
+		moves = ordered_moves(own, enemy, best)
+
+		# With no legal moves the player has to pass, and if neither player
+		# 	can move the game is a draw.
+		if not moves:
+			if not any(True for _ in generate(enemy, own)):
+				return 0
+			return -self.negamax(
+				enemy, own, depth - 1, -beta, -alpha, ply + 1,
+				zobrist.update_pass(key), rules.opponent(color)
+			)
+
+		original_alpha = alpha
+		best_score = -WIN - 1
+		best_move = None
+		enemy_color = rules.opponent(color)
+		for move in moves:
+			start, end = move
+			child_key = zobrist.update(key, color, start, end, enemy >> end & 1)
+			score = -self.negamax(
+				*make_move(own, enemy, move), depth - 1, -beta, -alpha, ply + 1,
+				child_key, enemy_color
+			)
+			if score > best_score:
+				best_score = score
+				best_move = move
+				if score > alpha:
+					alpha = score
+					if alpha >= beta:
+						break
+
+		if best_score >= beta:
+			flag = LOWER
+		elif best_score > original_alpha:
+			flag = EXACT
+		else:
+			flag = UPPER
+		self.table.store(key, depth, flag, to_table(best_score, ply), encode_move(*best_move))
+
+		return best_score
+
+	# Score a node one move above the leaves without making every move. The
+	# 	only thing a move can change about the material is whether it kills,
+	# 	so the best reply is any kill, or else any move at all.
+	# Returns None if the player has to pass, which needs the full search.
+	def frontier(self, own, enemy, ply):
+		occupied = own | enemy
+		for start in squares(own):
+			if hits(start, occupied) & enemy:
+				if enemy & (enemy - 1) == 0:
+					return WIN - ply - 1
+				return evaluate(own, enemy) + PIECE_VALUE
+
+		for start in squares(own):
+			if legal_destinations(start, own, enemy):
+				return evaluate(own, enemy)
+
+
+# Choose a move for the player whose turn it is in a GameState.
+# time_limit is only used when no searcher is given, which otherwise keeps its
+# 	own budget and reports its statistics afterwards.
+# Returns a pair of xy-coordinate tuples, or None if the player has to pass.
+def choose_move(state, time_limit=1.0, searcher=None):
+	searcher = Searcher(time_limit) if searcher is None else searcher
+	move = searcher.search(*sides(state), state.player_color())
+	if move is None:
+		return None
+	return rules.coords(move[0]), rules.coords(move[1])
@@ -0,0 +1,338 @@
+# batch.py
+
+# Plays thousands of Mad Rooks games at once with NumPy.
+# Each board is a pair of uint64 bitboards, one per player, in the same layout
+# 	as bitboard.py, so a batch is just two arrays. check_direction in all four
+# 	directions becomes a flood fill: a set of pieces is shifted one square at
+# 	a time through the empty squares, for every board (and every piece) at once.
+# All boards advance one move per step, with every player picking uniformly
+# 	among their legal moves.
+# Boards of more than 64 squares do not fit, and are left to movegen.py.
+# Needs NumPy 2.0 or later for bitwise_count.
+# Usage: python batch.py [GAMES] to compare it with the scalar move generators.
+
+from array import array
+from random import Random
+from time import perf_counter
+
+import numpy as np
+
+# Older NumPy is treated like no NumPy, so callers fall back to movegen.py.
+if not hasattr(np, 'bitwise_count'):
+	raise ImportError('batch.py needs NumPy 2.0 or later for bitwise_count')
+
+import rules
+import record
+from bitboard import from_board, to_board
+
+# The most squares a board can have to fit in a uint64.
+MAX_CELLS = 64
+
+ZERO = np.uint64(0)
+ONE = np.uint64(1)
+ONE_STEP = np.uint64(1)
+
+
+# Build the masks for the current board size.
+# Moving along y changes the index by one, so shifting by one bit would wrap
+# 	from the bottom of one column to the top of the next. NOT_FIRST_ROW and
+# 	NOT_LAST_ROW remove the squares that wrapped, and BOARD the ones shifted
+# 	past the last column of a board smaller than 64 squares.
+def _resize():
+	global CELLS, BOARD, NOT_FIRST_ROW, NOT_LAST_ROW, COLUMN_STEP, SLIDE_STEPS
+	CELLS = rules.CELLS
+	if CELLS > MAX_CELLS:
+		return
+
+	board = (1 << CELLS) - 1
+	first_row = sum(1 << rules.square(x, 0) for x in range(rules.WIDTH))
+	last_row = sum(1 << rules.square(x, rules.HEIGHT - 1) for x in range(rules.WIDTH))
+	BOARD = np.uint64(board)
+	NOT_FIRST_ROW = np.uint64(board ^ first_row)
+	NOT_LAST_ROW = np.uint64(board ^ last_row)
+	COLUMN_STEP = np.uint64(rules.HEIGHT)
+	SLIDE_STEPS = max(rules.WIDTH, rules.HEIGHT) - 2
+
+rules.on_resize(_resize)
+
+
+# Move every square in a set one step in each direction, dropping the ones that
+# 	leave the board. Same order as rules.DIRECTIONS.
+def _up(squares): return (squares >> ONE_STEP) & NOT_LAST_ROW
+def _down(squares): return (squares << ONE_STEP) & NOT_FIRST_ROW
+def _left(squares): return squares >> COLUMN_STEP
+def _right(squares): return (squares << COLUMN_STEP) & BOARD
+
+SHIFTS = (_up, _down, _left, _right)
+
+
+# Slide a set of pieces in one direction through the empty squares.
+# Returns every square they pass over, plus the first square that stops each
+# 	of them (which is occupied, or off the board and so dropped).
+def slide(pieces, empty, shift):
+	flood = pieces
+	for _ in range(SLIDE_STEPS):
+		flood = flood | (shift(flood) & empty)
+	return shift(flood)
+
+
+# Split each board's set of pieces into single-square sets.
+# Returns a (boards, most pieces on any board) array, padded with zeros.
+def split_pieces(pieces):
+	count = int(np.bitwise_count(pieces).max()) if len(pieces) else 0
+	singles = np.zeros((len(pieces), count), dtype=np.uint64)
+	rest = pieces.copy()
+	for column in range(count):
+		lowest = rest & (~rest + ONE)
+		singles[:, column] = lowest
+		rest ^= lowest
+	return singles
+
+
+# Find where every piece of the player to move can legally go.
+# own and enemy are arrays of bitboards, one pair per board.
+# Returns (pieces, destinations): both (boards, most pieces) arrays, holding
+# 	each piece as a single-square bitboard and the bitboard of its legal
+# 	destination squares.
+def legal_destinations(own, enemy):
+	occupied = own | enemy
+	empty = ~occupied & BOARD
+
+	# engaged is every square that an enemy piece can see along a row or
+	# 	column, i.e. where not_engaging is False for an empty square. Seen
+	# 	the other way round, it also holds the pieces that have somebody to
+	# 	kill (can_kill).
+	engaged = ZERO
+	for shift in SHIFTS:
+		engaged = engaged | slide(enemy, empty, shift)
+	engaged = engaged[:, None]
+
+	pieces = split_pieces(own)
+	reach = np.zeros_like(pieces)
+	kills = np.zeros_like(pieces)
+	empty = empty[:, None]
+	enemy = enemy[:, None]
+	for shift in SHIFTS:
+		seen = slide(pieces, empty, shift)
+		reach |= seen & empty
+		kills |= seen & enemy
+
+	# A piece that can kill must kill, otherwise it may slide to any square
+	# 	it would be engaging from.
+	destinations = np.where(kills != ZERO, kills, reach & engaged)
+	return pieces, destinations
+
+
+class BoardBatch():
+
+	# red and blue are arrays of bitboards (as Python ints or uint64), and
+	# 	red_turn says whose turn it is on each board.
+	# With record set, the moves of every game are kept in records as
+	# 	record.py codes.
+	def __init__(self, red, blue, red_turn, seed=None, max_turns=rules.MAX_TURNS, record=False):
+		if CELLS > MAX_CELLS:
+			raise ValueError(f'batch.py only plays on boards of up to {MAX_CELLS} squares.')
+
+		self.red = np.array(red, dtype=np.uint64)
+		self.blue = np.array(blue, dtype=np.uint64)
+		self.red_turn = np.array(red_turn, dtype=bool)
+		self.rng = np.random.default_rng(seed)
+		self.max_turns = max_turns
+
+		count = len(self.red)
+		self.turn_counts = np.zeros(count, dtype=np.int32)
+		self.passed = np.zeros(count, dtype=bool)
+		self.finished = np.zeros(count, dtype=bool)
+
+		# The winning color of each finished game, EMPTY for a draw.
+		self.winners = np.zeros(count, dtype=np.int8)
+		self._check_winners()
+
+		self.records = [array('H') for _ in range(count)] if record else None
+
+	# count boards at the same position, a rules.py board.
+	@classmethod
+	def repeat(cls, board, red_turn, count, seed=None, max_turns=rules.MAX_TURNS, record=False):
+		red, blue = from_board(board)
+		return cls([red] * count, [blue] * count, [red_turn] * count, seed, max_turns, record)
+
+	# count boards, all at the starting position with RED to move.
+	@classmethod
+	def starting(cls, count, seed=None, max_turns=rules.MAX_TURNS, record=False):
+		return cls.repeat(rules.starting_board(), True, count, seed, max_turns, record)
+
+	def __len__(self):
+		return len(self.red)
+
+	# The rules.GameState of one board.
+	def state(self, row):
+		board = to_board(int(self.red[row]), int(self.blue[row]))
+		return rules.GameState(board, bool(self.red_turn[row]), int(self.turn_counts[row]))
+
+	# The bitboards of the player to move and their opponent on the boards
+	# 	in rows.
+	def sides(self, rows):
+		red_turn = self.red_turn[rows]
+		red = self.red[rows]
+		blue = self.blue[rows]
+		return np.where(red_turn, red, blue), np.where(red_turn, blue, red)
+
+	# List the legal moves on one board as (start, end) board indexes.
+	def moves(self, row):
+		pieces, destinations = legal_destinations(*self.sides([row]))
+		return [
+			(int(piece).bit_length() - 1, end)
+			for piece, ends in zip(pieces[0], destinations[0])
+			for end in range(CELLS) if int(ends) >> end & 1
+		]
+
+	# Advance every unfinished game by one random legal move.
+	def step(self):
+		rows = np.flatnonzero(~self.finished)
+		if not len(rows):
+			return
+
+		own, enemy = self.sides(rows)
+		pieces, destinations = legal_destinations(own, enemy)
+
+		# Number every legal move on a board, pick one at random, then find
+		# 	the piece it belongs to and which of that piece's moves it is.
+		counts = np.bitwise_count(destinations).astype(np.int32)
+		totals = counts.sum(axis=1)
+		has_move = totals > 0
+
+		picks = (self.rng.random(len(rows)) * totals).astype(np.int32)
+		running = np.cumsum(counts, axis=1)
+		columns = (running > picks[:, None]).argmax(axis=1)
+		picks -= running[np.arange(len(rows)), columns] - counts[np.arange(len(rows)), columns]
+
+		starts = pieces[np.arange(len(rows)), columns]
+		chosen = destinations[np.arange(len(rows)), columns]
+		bits = np.unpackbits(chosen.astype('<u8').view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+		ends = (np.cumsum(bits, axis=1) > picks[:, None]).argmax(axis=1).astype(np.uint64)
+
+		if self.records is not None:
+			self._record(rows, has_move, starts, ends, enemy)
+
+		# Make the moves, and give the turn to the other player everywhere.
+		ends = np.where(has_move, ONE << ends, ZERO)
+		starts = np.where(has_move, starts, ZERO)
+		own = (own ^ starts) | ends
+		enemy = enemy & ~ends
+
+		red_turn = self.red_turn[rows]
+		self.red[rows] = np.where(red_turn, own, enemy)
+		self.blue[rows] = np.where(red_turn, enemy, own)
+		self.red_turn[rows] = ~red_turn
+		self.turn_counts[rows] += has_move
+
+		# A player with no legal moves passes, and if the other player had
+		# 	just passed too, the game is a draw.
+		stuck = rows[~has_move & self.passed[rows]]
+		self.finished[stuck] = True
+		self.passed[rows] = ~has_move
+
+		self._check_winners()
+
+	# Add the moves just chosen to the records. starts holds single-square
+	# 	bitboards and ends board indexes, and neither means anything where
+	# 	has_move is False.
+	def _record(self, rows, has_move, starts, ends, enemy):
+		start_indexes = np.bitwise_count(np.where(has_move, starts, ONE) - ONE)
+		killed = (enemy >> ends) & ONE != ZERO
+		codes = (
+			(start_indexes.astype(np.int32) << 6) | ends.astype(np.int32)
+			| np.where(killed, record.KILL, 0)
+		)
+		codes = np.where(has_move, codes, record.PASS)
+
+		records = self.records
+		for row, code in zip(rows.tolist(), codes.tolist()):
+			records[row].append(code)
+
+	# Play every game to the end.
+	def run(self):
+		while not self.finished.all():
+			self.step()
+
+	# Finish the games where a player has no pieces left or that have run too
+	# 	long.
+	def _check_winners(self):
+		red = self.red != ZERO
+		blue = self.blue != ZERO
+
+		won = ~self.finished & (red != blue)
+		self.winners[won] = np.where(red[won], rules.RED, rules.BLUE)
+		self.finished |= won | ~(red | blue) | (self.turn_counts >= self.max_turns)
+
+
+# Play count random games from the starting board.
+# Returns the (winners, turn_counts, records) arrays, with EMPTY winners for
+# 	draws. records is a list of each game's record codes if record is set,
+# 	otherwise None.
+def play_random_games(count, seed=None, max_turns=rules.MAX_TURNS, record=False):
+	games = BoardBatch.starting(count, seed, max_turns, record)
+	games.run()
+	return games.winners, games.turn_counts, games.records
+
+
+# Play count random games from one position, for bulk rollouts.
+# own and enemy are the bitboards of the player to move and their opponent.
+# Returns how many games the player to move won, lost and drew.
+def rollouts(own, enemy, count, seed=None, max_turns=rules.MAX_TURNS):
+	games = BoardBatch([own] * count, [enemy] * count, [True] * count, seed, max_turns)
+	games.run()
+	winners = games.winners
+	return (
+		int((winners == rules.RED).sum()),
+		int((winners == rules.BLUE).sum()),
+		int((winners == rules.EMPTY).sum())
+	)
+
+
+# Check the batch move generator against movegen.py on random positions, then
+# 	compare random self-play through it with looping the scalar rules.
+def benchmark(games=4096, seed=0):
+	from mcts import playout
+	from movegen import generate, sides
+	from perft import legacy_moves
+
+	rng = Random(seed)
+	positions = [
+		rules.GameState(bytearray(rng.choice((0, 0, 1, 2)) for _ in range(CELLS)), rng.random() < 0.5)
+		for _ in range(500)
+	]
+	bits = [from_board(state.board) for state in positions]
+	check = BoardBatch([red for red, _ in bits], [blue for _, blue in bits], [state.red_turn for state in positions])
+	for row, state in enumerate(positions):
+		if sorted(check.moves(row)) != sorted(generate(*sides(state))):
+			raise AssertionError(f'batch moves differ on position {row}')
+
+	start = perf_counter()
+	winners, turn_counts, _ = play_random_games(games, seed)
+	batch_time = perf_counter() - start
+	print(f'batch.py:   {games} games in {batch_time:.2f}s ({games / batch_time:,.0f} games/s, {turn_counts.mean():.1f} turns on average)')
+
+	scalar_games = max(1, games // 16)
+	start = perf_counter()
+	for _ in range(scalar_games):
+		playout(*sides(rules.GameState()), rng)
+	scalar_time = perf_counter() - start
+	print(f'movegen.py: {scalar_games} games in {scalar_time:.2f}s ({scalar_games / scalar_time:,.0f} games/s)')
+
+	legacy_games = max(1, games // 256)
+	start = perf_counter()
+	for _ in range(legacy_games):
+		state = rules.GameState()
+		while state.winner() is None:
+			moves = list(legacy_moves(state))
+			if not moves:
+				break
+			state.move(*rng.choice(moves))
+	legacy_time = perf_counter() - start
+	print(f'rules.py:   {legacy_games} games in {legacy_time:.2f}s ({legacy_games / legacy_time:,.0f} games/s)')
+
+
+if __name__ == '__main__':
+	import sys
+	benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 4096)
@@ -0,0 +1,185 @@
+# bitboard.py
+
+# A bitboard backend for the Mad Rooks rules in rules.py.
+# Each player's pieces are a single int with one bit per square, using the
+# 	same numbering as rules.square (bit x * HEIGHT + y), and the occupancy is
+# 	the two of them or'ed together. Sliding along a row or column is then a
+# 	lookup in a precomputed ray table followed by picking the nearest set bit.
+# Python ints have no fixed width, so this works on every board size; on a
+# 	16x16 board a bitboard is just a 256-bit int.
+
+from random import Random
+from time import perf_counter
+
+import rules
+from rules import DIRECTIONS
+
+
+# Build RAYS[direction][square], the mask of every square from square (not
+# 	included) to the edge of the board in that direction.
+def _build_rays():
+	rays = []
+	for x_dir, y_dir in DIRECTIONS:
+		table = []
+		for index in range(rules.CELLS):
+			x, y = rules.coords(index)
+			mask = 0
+			x += x_dir
+			y += y_dir
+			while 0 <= x < rules.WIDTH and 0 <= y < rules.HEIGHT:
+				mask |= 1 << rules.square(x, y)
+				x += x_dir
+				y += y_dir
+			table.append(mask)
+		rays.append(tuple(table))
+	return tuple(rays)
+
+
+# Rebuild the ray tables for the current board size.
+def _resize():
+	global FULL, RAYS, UP_RAYS, DOWN_RAYS, LEFT_RAYS, RIGHT_RAYS
+	FULL = (1 << rules.CELLS) - 1
+	RAYS = _build_rays()
+	UP_RAYS, DOWN_RAYS, LEFT_RAYS, RIGHT_RAYS = RAYS
+
+rules.on_resize(_resize)
+
+
+# Yield the index of every set bit in mask, lowest first.
+def squares(mask):
+	while mask:
+		bit = mask & -mask
+		yield bit.bit_length() - 1
+		mask ^= bit
+
+
+# Convert a rules.py board into a (red, blue) pair of bitboards.
+def from_board(board):
+	red = 0
+	blue = 0
+	for index, color in enumerate(board):
+		if color == rules.RED: red |= 1 << index
+		elif color == rules.BLUE: blue |= 1 << index
+	return red, blue
+
+
+# Convert a (red, blue) pair of bitboards back into a rules.py board.
+def to_board(red, blue):
+	board = bytearray(rules.CELLS)
+	for index in squares(red): board[index] = rules.RED
+	for index in squares(blue): board[index] = rules.BLUE
+	return board
+
+
+# Find the first occupied square in each direction from index.
+# Returns a mask with one bit for every piece that a rook on index can see.
+def hits(index, occupied):
+	found = 0
+
+	# Up and Left run towards lower indexes, so the nearest piece is the
+	# 	highest set bit.
+	blockers = UP_RAYS[index] & occupied
+	if blockers: found |= 1 << (blockers.bit_length() - 1)
+	blockers = LEFT_RAYS[index] & occupied
+	if blockers: found |= 1 << (blockers.bit_length() - 1)
+
+	# Down and Right run towards higher indexes, so it is the lowest set bit.
+	blockers = DOWN_RAYS[index] & occupied
+	if blockers: found |= blockers & -blockers
+	blockers = RIGHT_RAYS[index] & occupied
+	if blockers: found |= blockers & -blockers
+
+	return found
+
+
+# Find the empty squares a piece on index can slide to before running into
+# 	another piece or the edge of the board.
+def reach(index, occupied):
+	found = 0
+	for rays in RAYS:
+		ray = rays[index]
+		blockers = ray & occupied
+		if blockers:
+			if ray > (1 << index):
+				first = (blockers & -blockers).bit_length() - 1
+			else:
+				first = blockers.bit_length() - 1
+			ray ^= rays[first] | (1 << first)
+		found |= ray
+	return found
+
+
+# The bitboard version of rules.can_kill.
+# own and enemy are the bitboards of the moving player and their opponent.
+# Returns the mask of enemy pieces that the piece on index can kill.
+def can_kill(index, own, enemy):
+	return hits(index, own | enemy) & enemy
+
+
+# The bitboard version of rules.not_engaging, inverted: whether a piece moved
+# 	to index would be engaging an enemy piece. Like the original, an occupied
+# 	square always counts, and the moving piece is expected to still be in own.
+def engaging(index, own, enemy):
+	occupied = own | enemy
+	if occupied >> index & 1:
+		return True
+	return bool(hits(index, occupied) & enemy)
+
+
+# Compare the bitboard checks with the ones in rules.py on random positions,
+# 	and report how long each takes per call. rules.py walks precomputed rays
+# 	now, which is at least as quick as the bitboards one square at a time, so
+# 	both are also compared with the square-by-square walk they replaced (kept
+# 	in rulebench.py). The bitboards pay off when a whole position's moves are
+# 	generated at once: see perft.py --check.
+def benchmark(positions=2000, seed=0):
+	from rulebench import legacy_can_kill, legacy_not_engaging
+
+	rng = Random(seed)
+	samples = []
+	for _ in range(positions):
+		board = bytearray(rng.choice((rules.EMPTY, rules.RED, rules.BLUE)) for _ in range(rules.CELLS))
+		samples.append((board, from_board(board)))
+
+	locations = [rules.coords(index) for index in range(rules.CELLS)]
+
+	# Both backends have to agree before their speed means anything.
+	for board, (red, blue) in samples:
+		for index, loc in enumerate(locations):
+			if sorted(rules.can_kill(loc, rules.RED, board)) != list(squares(can_kill(index, red, blue))):
+				raise AssertionError(f'can_kill differs at {loc}')
+			if rules.not_engaging(loc, rules.RED, board) == engaging(index, red, blue):
+				raise AssertionError(f'not_engaging differs at {loc}')
+
+	red_color = rules.RED
+
+	start = perf_counter()
+	for board, _ in samples:
+		for loc in locations:
+			legacy_can_kill(loc, red_color, board)
+			legacy_not_engaging(loc, red_color, board)
+	legacy_time = perf_counter() - start
+
+	start = perf_counter()
+	for board, _ in samples:
+		for loc in locations:
+			rules.can_kill(loc, red_color, board)
+			rules.not_engaging(loc, red_color, board)
+	rules_time = perf_counter() - start
+
+	start = perf_counter()
+	for _, (red, blue) in samples:
+		for index in range(rules.CELLS):
+			can_kill(index, red, blue)
+			engaging(index, red, blue)
+	fast_time = perf_counter() - start
+
+	calls = positions * rules.CELLS
+	print(f'{calls} can_kill + not_engaging queries, against the square-by-square walk')
+	print(f'  square by square: {legacy_time / calls * 1e6:.2f} us/query')
+	print(f'  rules.py rays:    {rules_time / calls * 1e6:.2f} us/query, {legacy_time / rules_time:.1f}x')
+	print(f'  bitboard.py:      {fast_time / calls * 1e6:.2f} us/query, {legacy_time / fast_time:.1f}x')
+
+
+if __name__ == '__main__':
+	benchmark()
@@ -0,0 +1,183 @@
+# book.py
+
+# An opening book for the computer players, built from self-play.
+# Every game starts from the same board, so the computer would otherwise search
+# 	the same early positions in every game. The book instead keeps, for every
+# 	position seen in the first few moves of many finished games, how often each
+# 	move was played there and how those games went for the player who made it.
+# A book file is a run of entries sorted by the position's Zobrist hash, stored
+# 	column by column so the hashes can be searched by bisection straight from
+# 	the memory-mapped file:
+# 	- the hashes (little-endian uint64).
+# 	- the moves (uint16 record.py codes).
+# 	- how many games played the move (uint32).
+# 	- the score of those games for the player who moved (int32): +1 for every
+# 		win and -1 for every loss.
+# Usage: python book.py BOOK [--games N] [--first POLICY] [--second POLICY]
+# 	[--plies N] [--records FILE...]
+# 	plays N games between the policies (see selfplay.py), adds the games in
+# 	any record files, and writes the book.
+
+from array import array
+from bisect import bisect_left, bisect_right
+from mmap import mmap, ACCESS_READ
+from sys import byteorder
+
+import rules
+import record
+import gamedb
+
+# The bytes one entry takes across the four columns.
+ENTRY_SIZE = 8 + 2 + 4 + 4
+
+# How many moves (plies) into each game are put in the book.
+DEFAULT_PLIES = 12
+
+# Only moves played in at least this many games are chosen from the book.
+MIN_COUNT = 4
+
+
+# Add the first plies moves of finished games to the statistics in stats, a
+# 	dictionary from position hash to {record code: [count, score]}.
+# games yields (winner, codes) pairs like record.read_games.
+# Returns stats.
+def collect(games, plies=DEFAULT_PLIES, stats=None):
+	stats = {} if stats is None else stats
+	for winner, codes in games:
+		color = rules.RED
+		for key, code in zip(gamedb.position_hashes(codes), codes[:plies]):
+			if not code & record.PASS:
+				result = 0 if winner == rules.EMPTY else (1 if winner == color else -1)
+				entry = stats.setdefault(key, {}).setdefault(code & ~record.KILL, [0, 0])
+				entry[0] += 1
+				entry[1] += result
+			color = rules.opponent(color)
+	return stats
+
+
+# Write the statistics from collect to a book file.
+def write(path, stats):
+	keys = array('Q')
+	moves = array('H')
+	counts = array('I')
+	scores = array('i')
+	for key in sorted(stats):
+		for code, (count, score) in sorted(stats[key].items(), key=lambda item: -item[1][0]):
+			keys.append(key)
+			moves.append(code)
+			counts.append(count)
+			scores.append(score)
+
+	columns = (keys, moves, counts, scores)
+	if byteorder != 'little':
+		for column in columns:
+			column.byteswap()
+	with open(path, 'wb') as file:
+		for column in columns:
+			column.tofile(file)
+
+
+class OpeningBook():
+
+	def __init__(self, path):
+		with open(path, 'rb') as file:
+			size = file.seek(0, 2)
+			self.map = mmap(file.fileno(), 0, access=ACCESS_READ) if size else None
+
+		count = size // ENTRY_SIZE
+		data = memoryview(self.map if self.map is not None else b'')
+		self.keys = gamedb.native_column(data[:count * 8].cast('Q'))
+		self.moves = gamedb.native_column(data[count * 8:count * 10].cast('H'))
+		self.counts = gamedb.native_column(data[count * 10:count * 14].cast('I'))
+		self.scores = gamedb.native_column(data[count * 14:count * 18].cast('i'))
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	# The number of entries in the book.
+	def __len__(self):
+		return len(self.keys)
+
+	# The book moves for a position hash, most played first.
+	# Returns a list of (start, end, count, score) tuples.
+	def entries(self, key):
+		start = bisect_left(self.keys, key)
+		stop = bisect_right(self.keys, key, start)
+		return [
+			(*record.decode_move(self.moves[row])[:2], self.counts[row], self.scores[row])
+			for row in range(start, stop)
+		]
+
+	# Pick the move with the best average score for a position hash among the
+	# 	ones played at least min_count times, preferring the most played.
+	# Returns a (start, end) pair of board indexes, or None if the book has no
+	# 	such move.
+	def choose(self, key, min_count=MIN_COUNT):
+		best = None
+		best_rank = None
+		for start, end, count, score in self.entries(key):
+			if count >= min_count and (best_rank is None or (score / count, count) > best_rank):
+				best = start, end
+				best_rank = score / count, count
+		return best
+
+	def close(self):
+		for column in (self.keys, self.moves, self.counts, self.scores):
+			column.release()
+		if self.map is not None:
+			self.map.close()
+			self.map = None
+
+
+def main():
+	from argparse import ArgumentParser
+	from os import cpu_count
+	from time import perf_counter
+
+	import selfplay
+
+	parser = ArgumentParser(description='Build a Mad Rooks opening book from self-play.')
+	parser.add_argument('book')
+	parser.add_argument('--games', type=int, default=1000, help='games to play for the book')
+	parser.add_argument('--first', default='search:2', help="policy: random, greedy or search:DEPTH")
+	parser.add_argument('--second', default='search:2', help="policy: random, greedy or search:DEPTH")
+	parser.add_argument('--plies', type=int, default=DEFAULT_PLIES, help='moves into each game to keep')
+	parser.add_argument('--opening', type=int, help='random moves at the start of each game (default: --plies)')
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--workers', type=int, default=cpu_count() or 1)
+	parser.add_argument('--records', nargs='*', default=[], help='game record files to add to the book')
+	args = parser.parse_args()
+
+	# The policies would play the same deterministic game every time, so the
+	# 	opening is played at random and the policies judge it by finishing the
+	# 	game.
+	opening = args.plies if args.opening is None else args.opening
+
+	stats = {}
+	for path in args.records:
+		collect(record.read_games(path), args.plies, stats)
+
+	if args.games:
+		selfplay.make_policy(args.first)
+		selfplay.make_policy(args.second)
+		jobs = selfplay.make_jobs(args.games, args.first, args.second, args.seed, opening, keep_record=True)
+		start = perf_counter()
+		played = 0
+		with rules.worker_pool(args.workers) as pool:
+			for finished in pool.imap_unordered(selfplay.play_job, jobs, chunksize=max(1, len(jobs) // (args.workers * 16))):
+				collect(((won, codes) for _, (won, _, codes) in finished), args.plies, stats)
+				played += len(finished)
+				if played % 100 == 0 or played == args.games:
+					elapsed = perf_counter() - start
+					print(f'\r{played}/{args.games} games, {played / elapsed * 60:,.0f} games/min', end='', flush=True)
+		print()
+
+	write(args.book, stats)
+	print(f'{sum(len(moves) for moves in stats.values())} entries for {len(stats)} positions')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,350 @@
+# gamedb.py
+
+# A database of finished games, kept in a directory of append-only files:
+# 	- games.mrg holds the games themselves, in the record.py format.
+# 	- games.idx has one fixed-size row per game (its offset in games.mrg,
+# 		number of record codes, turn count and winner), so game ids are row
+# 		numbers and any game is found without a scan.
+# 	- positions.*.seg and outcomes.*.seg are sorted index segments, read
+# 		through mmap and searched by bisection. The position index maps the
+# 		Zobrist hash of every position reached in a game to the game id; the
+# 		outcome index maps (winner, turn count) to the game id.
+# Adding a game only appends to games.mrg and games.idx. update_indexes then
+# 	indexes the games added since the last update into one new segment per
+# 	index, and merges an index's segments once there are too many of them.
+# Usage: python gamedb.py DIRECTORY import FILE...
+# 	python gamedb.py DIRECTORY outcome red|blue|draw [--min-turns N] [--max-turns N]
+# 	python gamedb.py DIRECTORY position GAME_ID TURN
+
+from array import array
+from bisect import bisect_left, bisect_right
+from heapq import merge
+from mmap import mmap, ACCESS_READ
+from pathlib import Path
+from struct import Struct
+from sys import byteorder
+
+import rules
+import record
+import zobrist
+
+GAME_ROW = Struct('<QHHB3x')
+
+# Merge an index's segments into one once it has more than this many.
+MAX_SEGMENTS = 8
+
+# The largest key in the outcome index for a winner.
+MAX_TURNS = 0xFFFF
+
+
+# Build the outcome index key for a winner and a turn count.
+def outcome_key(winner, turn_count):
+	return winner << 16 | turn_count
+
+
+# Yield the Zobrist hash of every position in a game, from the starting board
+# 	to the final position, without building any boards.
+def position_hashes(codes):
+	key = zobrist.hash_board(rules.starting_board())
+	color = rules.RED
+	yield key
+	for code in codes:
+		move = record.decode_move(code)
+		if move is None:
+			key = zobrist.update_pass(key)
+		else:
+			key = zobrist.update(key, color, *move)
+		color = rules.opponent(color)
+		yield key
+
+
+# Memory-map a file for reading, or return None if it is empty.
+def _map(path):
+	with open(path, 'rb') as file:
+		if not file.seek(0, 2):
+			return None
+		return mmap(file.fileno(), 0, access=ACCESS_READ)
+
+
+# A column of little-endian numbers cast from a memory map, in native order.
+# 	On a big-endian machine that takes a byteswapped copy, since the map
+# 	itself is read-only.
+def native_column(view):
+	if byteorder == 'little':
+		return view
+	column = array(view.format, view)
+	column.byteswap()
+	return memoryview(column)
+
+
+# One sorted segment of an index: count 64-bit keys followed by count 64-bit
+# 	values, covering the games first to end - 1.
+class Segment():
+
+	def __init__(self, path):
+		self.path = path
+		self.first, self.end = (int(part) for part in path.suffixes[-2][1:].split('-'))
+		self.map = _map(path)
+		if self.map is None:
+			self.keys = self.values = memoryview(b'').cast('Q')
+		else:
+			data = memoryview(self.map).cast('Q')
+			half = len(data) // 2
+			self.keys = native_column(data[:half])
+			self.values = native_column(data[half:])
+
+	def __len__(self):
+		return len(self.keys)
+
+	# The values of every key from low to high, both included.
+	def search(self, low, high):
+		start = bisect_left(self.keys, low)
+		stop = bisect_right(self.keys, high, start)
+		return self.values[start:stop].tolist()
+
+	# Yield every (key, value) pair in order.
+	def items(self):
+		return zip(self.keys, self.values)
+
+	def close(self):
+		self.keys.release()
+		self.values.release()
+		if self.map is not None:
+			self.map.close()
+
+	# Write a segment from (key, value) pairs that are already sorted.
+	@staticmethod
+	def write(path, pairs):
+		keys = array('Q')
+		values = array('Q')
+		for key, value in pairs:
+			keys.append(key)
+			values.append(value)
+		if byteorder != 'little':
+			keys.byteswap()
+			values.byteswap()
+		with open(path, 'wb') as file:
+			keys.tofile(file)
+			values.tofile(file)
+
+
+# A sorted index made of segments named NAME.FIRST-END.seg.
+class Index():
+
+	def __init__(self, directory, name):
+		self.directory = directory
+		self.name = name
+		self.segments = [
+			Segment(path) for path in sorted(directory.glob(f'{name}.*.seg'))
+		]
+
+	# The number of games covered by the index.
+	def end(self):
+		return max((segment.end for segment in self.segments), default=0)
+
+	# The values of every key from low to high, both included.
+	def search(self, low, high=None):
+		high = low if high is None else high
+		found = []
+		for segment in self.segments:
+			found.extend(segment.search(low, high))
+		return found
+
+	def _path(self, first, end):
+		return self.directory / f'{self.name}.{first:010d}-{end:010d}.seg'
+
+	# Add a segment for the games first to end - 1 from unsorted pairs.
+	def add(self, first, end, pairs):
+		path = self._path(first, end)
+		Segment.write(path, sorted(pairs))
+		self.segments.append(Segment(path))
+		if len(self.segments) > MAX_SEGMENTS:
+			self.compact()
+
+	# Merge all of the segments into one.
+	def compact(self):
+		if len(self.segments) < 2:
+			return
+		old = self.segments
+		path = self._path(min(segment.first for segment in old), max(segment.end for segment in old))
+		temporary = path.with_suffix('.tmp')
+		Segment.write(temporary, merge(*(segment.items() for segment in old)))
+
+		for segment in old:
+			segment.close()
+			segment.path.unlink()
+		temporary.replace(path)
+		self.segments = [Segment(path)]
+
+	def close(self):
+		for segment in self.segments:
+			segment.close()
+		self.segments = []
+
+
+class GameDatabase():
+
+	def __init__(self, directory):
+		self.directory = Path(directory)
+		self.directory.mkdir(parents=True, exist_ok=True)
+
+		self.games_path = self.directory / 'games.mrg'
+		self.rows_path = self.directory / 'games.idx'
+		self.writer = record.GameWriter(self.games_path)
+		self.rows_file = open(self.rows_path, 'ab')
+
+		self.positions = Index(self.directory, 'positions')
+		self.outcomes = Index(self.directory, 'outcomes')
+
+		# The maps are only reopened once games have been added.
+		self.games_map = None
+		self.rows_map = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	# The number of games in the database.
+	def __len__(self):
+		return self.rows_file.tell() // GAME_ROW.size
+
+	# Append a finished game. codes are its record.py codes and winner the
+	# 	winning color (rules.EMPTY for a draw).
+	# Returns the new game's id.
+	def add_game(self, codes, winner):
+		game_id = len(self)
+		turn_count = sum(1 for code in codes if not code & record.PASS)
+
+		offset = self.writer.file.tell()
+		self.writer.write(codes, winner)
+		self.rows_file.write(GAME_ROW.pack(offset, len(codes), turn_count, winner))
+		self._unmap()
+		return game_id
+
+	# Append a finished GameState.
+	def add_state(self, state):
+		return self.add_game(record.encode_history(state.history), state.winner() or rules.EMPTY)
+
+	# Append every game in a record file.
+	def import_records(self, path):
+		for winner, codes in record.read_games(path):
+			self.add_game(codes, winner)
+
+	# Index the games added since the last update.
+	def update_indexes(self):
+		count = len(self)
+		for index, pairs_for in ((self.positions, self._position_pairs), (self.outcomes, self._outcome_pairs)):
+			first = index.end()
+			if first < count:
+				index.add(first, count, pairs_for(first, count))
+
+	def _position_pairs(self, first, end):
+		for game_id in range(first, end):
+			_, _, codes = self.game(game_id)
+			for key in set(position_hashes(codes)):
+				yield key, game_id
+
+	def _outcome_pairs(self, first, end):
+		for game_id in range(first, end):
+			_, turn_count, winner = self._row(game_id)[1:]
+			yield outcome_key(winner, turn_count), game_id
+
+	# The ids of the games that reached a position, given by its Zobrist hash.
+	# Only games that have been indexed are found.
+	def games_with_position(self, key):
+		return sorted(self.positions.search(key))
+
+	# The ids of the games that reached the position of a GameState.
+	def games_with_state(self, state):
+		return self.games_with_position(zobrist.hash_state(state))
+
+	# The ids of the games won by winner (rules.EMPTY for draws) in
+	# 	min_turns to max_turns turns, both included.
+	# Only games that have been indexed are found.
+	def games_by_outcome(self, winner, min_turns=0, max_turns=MAX_TURNS):
+		return sorted(self.outcomes.search(outcome_key(winner, min_turns), outcome_key(winner, max_turns)))
+
+	# Read one game.
+	# Returns (winner, turn_count, codes).
+	def game(self, game_id):
+		offset, count, turn_count, winner = self._row(game_id)
+		start = offset + record.HEADER.size
+		codes = array('H')
+		codes.frombytes(self._games()[start:start + count * 2])
+		if byteorder != 'little':
+			codes.byteswap()
+		return winner, turn_count, codes
+
+	def _row(self, game_id):
+		if not 0 <= game_id < len(self):
+			raise IndexError(f'no game {game_id}')
+		if self.rows_map is None:
+			self.rows_file.flush()
+			self.rows_map = _map(self.rows_path)
+		return GAME_ROW.unpack_from(self.rows_map, game_id * GAME_ROW.size)
+
+	def _games(self):
+		if self.games_map is None:
+			self.writer.flush()
+			self.games_map = _map(self.games_path)
+		return self.games_map
+
+	def _unmap(self):
+		for mapped in (self.games_map, self.rows_map):
+			if mapped is not None:
+				mapped.close()
+		self.games_map = None
+		self.rows_map = None
+
+	def close(self):
+		self._unmap()
+		self.positions.close()
+		self.outcomes.close()
+		self.writer.close()
+		self.rows_file.close()
+
+
+def main():
+	from argparse import ArgumentParser
+
+	parser = ArgumentParser(description='Add games to and query a Mad Rooks game database.')
+	parser.add_argument('directory')
+	commands = parser.add_subparsers(dest='command', required=True)
+
+	add = commands.add_parser('import', help='append the games in record files and index them')
+	add.add_argument('files', nargs='+')
+
+	outcome = commands.add_parser('outcome', help='list the games with a result')
+	outcome.add_argument('winner', choices=['red', 'blue', 'draw'])
+	outcome.add_argument('--min-turns', type=int, default=0)
+	outcome.add_argument('--max-turns', type=int, default=MAX_TURNS)
+
+	position = commands.add_parser('position', help='list the games that reached a position of another game')
+	position.add_argument('game_id', type=int)
+	position.add_argument('turn', type=int, help='how many record codes into the game')
+
+	args = parser.parse_args()
+
+	with GameDatabase(args.directory) as database:
+		if args.command == 'import':
+			for path in args.files:
+				database.import_records(path)
+			database.update_indexes()
+			print(f'{len(database)} games')
+
+		elif args.command == 'outcome':
+			winner = {'red': rules.RED, 'blue': rules.BLUE, 'draw': rules.EMPTY}[args.winner]
+			print(*database.games_by_outcome(winner, args.min_turns, args.max_turns))
+
+		else:
+			_, _, codes = database.game(args.game_id)
+			for turn, key in enumerate(position_hashes(codes)):
+				if turn == args.turn:
+					print(*database.games_with_position(key))
+					break
+
+
+if __name__ == '__main__':
+	main()
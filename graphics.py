@@ -161,6 +161,9 @@ __version__ = "5.0beta"
 	#	 Added Entry boxes.
 
 import time, os
+from collections import deque
+from itertools import islice
+from contextlib import contextmanager
 
 try:  # import as appropriate for 2.x vs. 3.x
    import tkinter as tk
@@ -181,8 +184,19 @@ BAD_OPTION = "Illegal option value"
 ##########################################################################
 # global variables and funtions
 
-_root = tk.Tk()
-_root.withdraw()
+# The hidden Tk root every window belongs to. It is only created when the
+#	first window or image needs it, so importing this module works without a
+#	display.
+_root = None
+
+def _getRoot():
+	global _root
+	if _root is None:
+		_root = tk.Tk()
+		_root.withdraw()
+		# MacOS fix 1
+		_root.update()
+	return _root
 
 _update_lasttime = time.time()
 
@@ -197,7 +211,7 @@ def update(rate=None):
 		else:
 			_update_lasttime = now
 
-	_root.update()
+	_getRoot().update()
 
 ############################################################################
 # Graphics classes start here
@@ -209,7 +223,7 @@ class GraphWin(tk.Canvas):
 	def __init__(self, title="Graphics Window",
 				 width=200, height=200, autoflush=True):
 		assert type(title) == type(""), "Title must be a string"
-		master = tk.Toplevel(_root)
+		master = tk.Toplevel(_getRoot())
 		master.protocol("WM_DELETE_WINDOW", self.close)
 		tk.Canvas.__init__(self, master, width=width, height=height,
 						   highlightthickness=0, bd=0)
@@ -217,7 +231,8 @@ class GraphWin(tk.Canvas):
 		self.pack()
 		master.resizable(0,0)
 		self.foreground = "black"
-		self.items = []
+		# The drawn objects by Tk id, in the order they were drawn.
+		self.items = {}
 		self.mouseX = None
 		self.mouseY = None
 		self.bind("<Button-1>", self._onClick)
@@ -232,6 +247,15 @@ class GraphWin(tk.Canvas):
 		self.closed = False
 		master.lift()
 		self.lastKey = ""
+		self._keyCallback = None
+		# Clicks (in screen coordinates) and keys that have not been read yet.
+		# Only the latest ones matter, so old ones fall off the end.
+		self._clicks = deque(maxlen=16)
+		self._keys = deque(maxlen=16)
+		# Written on every click, key press and close, to wake up whatever
+		# is waiting for one in _wait.
+		self._wakeup = tk.BooleanVar(master)
+		self._running = False
 		if autoflush: _root.update()
 
 	def __repr__(self):
@@ -251,13 +275,24 @@ class GraphWin(tk.Canvas):
 
 	def _onKey(self, evnt):
 		self.lastKey = evnt.keysym
+		self._keys.append(evnt.keysym)
+		if self._keyCallback:
+			self._keyCallback(evnt.keysym)
+		self._wakeup.set(True)
 
 	def _onClick(self, e):
 		self.mouseX = e.x
 		self.mouseY = e.y
 		self.clicked = True
+		self._clicks.append((e.x, e.y))
 		if self._mouseCallback:
 			self._mouseCallback(Point(e.x, e.y))
+		self._wakeup.set(True)
+
+	def _wait(self):
+		"""Run the Tk event loop until a click, key press or close, without
+		polling"""
+		_root.wait_variable(self._wakeup)
 
 	def _mousemotion(self, e):
 		'''Callback for mouse motion in the GUI.'''
@@ -289,6 +324,7 @@ class GraphWin(tk.Canvas):
 
 		if self.closed: return
 		self.closed = True
+		self._wakeup.set(True)
 		self.master.destroy()
 		self.__autoflush()
 
@@ -325,17 +361,29 @@ class GraphWin(tk.Canvas):
 		self.__checkOpen()
 		self.update_idletasks()
 
+	@contextmanager
+	def batch(self):
+		"""Hold back autoflush inside a with block, then update the window
+		once at the end, so that drawing many objects costs a single
+		flush. Batches can be nested; only the outermost one flushes."""
+		autoflush = self.autoflush
+		self.autoflush = False
+		try:
+			yield self
+		finally:
+			self.autoflush = autoflush
+			if autoflush and not self.closed:
+				_root.update()
+
 	def getMouse(self):
 		"""Wait for mouse click and return Point object representing
 		the click"""
 		self.update()	  # flush any prior clicks
-		self.mouseX = None
-		self.mouseY = None
-		while self.mouseX == None or self.mouseY == None:
-			self.update()
+		self._clicks.clear()
+		while not self._clicks:
 			if self.isClosed(): raise GraphicsError("getMouse in closed window")
-			time.sleep(.1) # give up thread
-		x,y = self.toWorld(self.mouseX, self.mouseY)
+			self._wait()
+		x,y = self.toWorld(*self._clicks.popleft())
 		self.mouseX = None
 		self.mouseY = None
 		return Point(x,y)
@@ -346,8 +394,9 @@ class GraphWin(tk.Canvas):
 		if self.isClosed():
 			raise GraphicsError("checkMouse in closed window")
 		self.update()
-		if self.mouseX != None and self.mouseY != None:
-			x,y = self.toWorld(self.mouseX, self.mouseY)
+		if self._clicks:
+			x,y = self.toWorld(*self._clicks[-1])
+			self._clicks.clear()
 			self.mouseX = None
 			self.mouseY = None
 			return Point(x,y)
@@ -357,12 +406,12 @@ class GraphWin(tk.Canvas):
 	def getKey(self):
 		"""Wait for user to press a key and return it as a string."""
 		self.lastKey = ""
-		while self.lastKey == "":
-			self.update()
+		self._keys.clear()
+		while not self._keys:
 			if self.isClosed(): raise GraphicsError("getKey in closed window")
-			time.sleep(.1) # give up thread
+			self._wait()
 
-		key = self.lastKey
+		key = self._keys.popleft()
 		self.lastKey = ""
 		return key
 
@@ -371,7 +420,8 @@ class GraphWin(tk.Canvas):
 		if self.isClosed():
 			raise GraphicsError("checkKey in closed window")
 		self.update()
-		key = self.lastKey
+		key = self._keys[-1] if self._keys else ""
+		self._keys.clear()
 		self.lastKey = ""
 		return key
 
@@ -398,27 +448,48 @@ class GraphWin(tk.Canvas):
 			return x,y
 
 	def setMouseHandler(self, func):
+		"""Call func with a Point (in screen coordinates) on every click,
+		or stop calling anything if func is None"""
 		self._mouseCallback = func
 
+	def setKeyHandler(self, func):
+		"""Call func with the key name on every key press, or stop calling
+		anything if func is None"""
+		self._keyCallback = func
+
+	def run(self):
+		"""Handle events, calling the mouse and key handlers and anything
+		scheduled with after(), until stop() is called or the window is
+		closed"""
+		self._running = True
+		while self._running and not self.isClosed():
+			self._wait()
+		self._running = False
+
+	def stop(self):
+		"""Make run() return once the current handler is done"""
+		self._running = False
+		self._wakeup.set(True)
+
 	def addItem(self, item):
-		self.items.append(item)
+		self.items[item.id] = item
 
 	def delItem(self, item):
-		self.items.remove(item)
+		self.items.pop(item.id, None)
 
 	def redraw(self):
-		hide = Rectangle(Point(-5, -5), Point(self.width + 1, self.height + 1))
-		hide.draw(self)
-		for item in self.items[:]:
-			item.undraw()
-			item.draw(self)
-			hide.lift()
-		
-		hide.undraw()
+		"""Re-create every drawn object in drawing order, e.g. after the
+		coordinates change, and update the window once at the end"""
+		items = self.items
+		self.items = {}
+		for item in items.values():
+			self.delete(item.id)
+			item.id = item._draw(self, item.config)
+			self.items[item.id] = item
 		self.update()
 
 	def clear(self, start=0):
-		for item in self.items[start:]:
+		for item in list(islice(self.items.values(), start, None)):
 			item.undraw()
 
 
@@ -764,13 +835,13 @@ class Polygon(GraphicsObject):
 			p.move(dx,dy)
 
 	def _draw(self, canvas, options):
-		args = [canvas]
+		args = []
 		for p in self.points:
 			x,y = canvas.toScreen(p.x,p.y)
 			args.append(x)
 			args.append(y)
 		args.append(options)
-		return GraphWin.create_polygon(*args)
+		return canvas.create_polygon(*args)
 
 class Text(GraphicsObject):
 
@@ -844,10 +915,10 @@ class Image(GraphicsObject):
 		self.imageId = Image.idCount
 		Image.idCount = Image.idCount + 1
 		if len(pixmap) == 1: # file name provided
-			self.img = tk.PhotoImage(file=pixmap[0], master=_root)
+			self.img = tk.PhotoImage(file=pixmap[0], master=_getRoot())
 		else: # width and height provided
 			width, height = pixmap
-			self.img = tk.PhotoImage(master=_root, width=width, height=height)
+			self.img = tk.PhotoImage(master=_getRoot(), width=width, height=height)
 
 	def __repr__(self):
 		return "Image({}, {}, {})".format(self.anchor, self.getWidth(), self.getHeight())
@@ -1075,9 +1146,6 @@ def show_all_colors():
 #MacOS fix 2
 #tk.Toplevel(_root).destroy()
 
-# MacOS fix 1
-update()
-
 if __name__ == "__main__":
 	# test()
 	show_all_colors()
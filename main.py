@@ -4,66 +4,101 @@ from pathlib import Path
 ROOT = Path(__file__).parent.absolute()
 
 from graphics import *
-GW = GraphWin('Mad Rooks', 1000, 615)
+
+# The game window, opened by open_window when a game starts rather than on
+# 	import, so the rest of this module can be used without a display.
+GW = None
 
 from random import choice
 from math import floor
 
 from webbrowser import open_new_tab
+from argparse import ArgumentParser
+
+import rules
+import ai
+import record
+import gamedb
+import movegen
+from book import OpeningBook
+from bitboard import squares
+
+# Finished games are appended to this file unless told otherwise.
+RECORD_PATH = ROOT / 'games.mrg'
 
 BLUE = color_rgb(0, 113, 187)
 RED = color_rgb(238, 28, 37)
-SQUARE_SIZE = 55
+
+# The board is drawn across BOARD_PIXELS, whatever its size. On the standard
+# 	8x8 board a square is 55 pixels.
+BOARD_PIXELS = 440
+
+
+def _fit_board():
+	global SQUARE_SIZE
+	SQUARE_SIZE = BOARD_PIXELS // max(rules.WIDTH, rules.HEIGHT)
+
+rules.on_resize(_fit_board)
+
+# The color of the squares the selected piece can move to.
+HIGHLIGHT = color_rgb(255, 230, 120)
 X_OFFSET = 25
 
+# The on-screen color of each player in the rules engine.
+COLORS = {rules.RED: RED, rules.BLUE: BLUE}
+
 
 
 # Create the Game Pieces.
+# There is one Piece on every square, drawn once and kept for the whole game.
+# 	An empty square's piece is hidden by clearing its colors, so showing a
+# 	change only reconfigures the existing canvas item.
 class Piece():
 	
-	def __init__(self, top_corner, name, piece_num):
+	# color is the rules color on the square, rules.EMPTY for none.
+	# square is the Rectangle drawn for the square, which highlight recolors.
+	def __init__(self, top_corner, name, color, square=None):
 		
 		center_x = top_corner.x + SQUARE_SIZE / 2
 		center_y = top_corner.y + SQUARE_SIZE / 2
 		radius = floor(SQUARE_SIZE / 2) - 4
 
-		color = BLUE if piece_num % 2 == 0 else RED
-
 		self.circle = Circle(Point(center_x, center_y), radius)
-		self.circle.setFill(color)
-		self.circle.setWidth(2)
-		self.circle.draw(GW)
-
-		self.color = color
 		self.x = center_x
 		self.y = center_y
-		self.hidden = False
 
 		self.name = name
+		self.square = square
+		self.square_color = square.config['fill'] if square else None
+		self.show(color)
+		self.circle.draw(GW)
 
 	def select(self):
-		self.circle.setOutline('gold')
-		self.circle.setWidth(5)
+		with GW.batch():
+			self.circle.setOutline('gold')
+			self.circle.setWidth(5)
 
 	def unselect(self):
-		self.circle.setOutline('black')
-		self.circle.setWidth(2)
+		with GW.batch():
+			self.circle.setOutline('black')
+			self.circle.setWidth(2)
 	
-	def draw(self):
-		self.unselect()
-		self.circle.draw(GW)
-
-	def undraw(self):
-		self.hidden = True
-		self.circle.undraw()
-
-	def change_color(self, new_color):
-		self.circle.setFill(new_color)
-		self.color = new_color
-
-		if self.hidden:
-			self.hidden = False
-			self.draw()
+	# Mark the square as somewhere the selected piece can go, or unmark it.
+	def highlight(self, on=True):
+		if self.square:
+			self.square.setFill(HIGHLIGHT if on else self.square_color)
+
+	# Show a player's piece on the square, or nothing for rules.EMPTY. This
+	# 	also clears any selection.
+	def show(self, color):
+		with GW.batch():
+			if color == rules.EMPTY:
+				self.circle.setFill('')
+				self.circle.setOutline('')
+			else:
+				self.circle.setFill(COLORS[color])
+				self.unselect()
+		self.color = color
 
 
 # Create the messages for each player.
@@ -109,44 +144,174 @@ class InvalidMessage():
 		if not header: self.text.setText(f'{message}')
 
 
-def main():
-	
-	# Place the game title and rules on the GraphWin
-	draw_title()
-	draw_rules()
-
-	# grid_origin is a tuple composed of the xy-coordinates for the
-	# 	upper-left corner of the grid.
-	# pieces is a 2D-array storing the locations of all of the players' pieces.
-	grid_origin, pieces = draw_board()
-
-	# red_message is a tuple storing the two text elements that tell the
-	# 	players that it is BLUE's turn.
-	# blue_message is the same, but for the text saying it's RED's turn.
-	red_message, blue_message = draw_player_messages()
-
-	# invalid_message is a text box that explains why a player cannot make
-	# 	a certain move.
-	invalid_message = draw_invalid_move_textbox()
+# computer is the rules color (rules.RED or rules.BLUE) played by the computer,
+# 	or None for two human players.
+# think_time is how many seconds the computer may spend on each move.
+# record_path is the game record file the finished game is appended to, or
+# 	None to not keep it.
+# database_path is a gamedb.py directory the finished game is also added to,
+# 	or None.
+# book_path is a book.py opening book the computer plays from while it can, or
+# 	None.
+def main(computer=None, think_time=1.0, record_path=RECORD_PATH, database_path=None, book_path=None):
+
+	# Game records only hold games on the 8x8 board.
+	if (rules.WIDTH, rules.HEIGHT) != (8, 8):
+		record_path = database_path = None
+
+	open_window()
+
+	# The whole window is drawn before it is updated once.
+	with GW.batch():
+
+		# Place the game title and rules on the GraphWin
+		draw_title()
+		draw_rules()
+
+		# state holds the board, whose turn it is and how many turns have been
+		# 	taken. All of the rules are checked against it, and the pieces on the
+		# 	GraphWin are only a rendering of it.
+		state = rules.GameState()
+
+		# grid_origin is a tuple composed of the xy-coordinates for the
+		# 	upper-left corner of the grid.
+		# pieces is a 2D-array storing the locations of all of the players' pieces.
+		grid_origin, pieces = draw_board(state)
+
+		# red_message is a tuple storing the two text elements that tell the
+		# 	players that it is BLUE's turn.
+		# blue_message is the same, but for the text saying it's RED's turn.
+		red_message, blue_message = draw_player_messages()
+
+		# invalid_message is a text box that explains why a player cannot make
+		# 	a certain move.
+		invalid_message = draw_invalid_move_textbox()
+
+	# searcher picks the computer's moves, within think_time seconds each.
+	searcher = ai.Searcher(think_time, book=OpeningBook(book_path) if book_path else None)
+
+	# Play the game, handling the window's events until somebody wins or the
+	# 	window is closed.
+	game = Game(state, grid_origin, pieces, red_message, blue_message, invalid_message, computer, searcher)
+	game.start()
+	GW.run()
+	if not game.over:
+		return
 
-	# red_turn is a boolean that tells who's turn it is. If true, it is BLUE's
-	# 	turn, else it it RED's turn.
-	red_turn = True
+	if record_path:
+		with record.GameWriter(record_path) as writer:
+			writer.write(record.encode_history(state.history), state.winner())
+	if database_path:
+		with gamedb.GameDatabase(database_path) as database:
+			database.add_state(state)
+			database.update_indexes()
+
+	GW.getKey()
+
+
+# Open the game window, unless it is already open.
+# window replaces the game window with another one that works like a GraphWin,
+# 	such as an offscreen.OffscreenWin.
+def open_window(window=None):
+	global GW
+	if window is not None:
+		GW = window
+	elif GW is None:
+		GW = GraphWin('Mad Rooks', 1000, 615)
+	return GW
+
+
+# How to use the replay viewer, shown next to the board.
+VIEWER_HELP = '''
+Right / Left: step forward / back
+Up / Down: 10 moves forward / back
+Home / End: first / last move
+Space: play / pause
++ / -: play faster / slower
+Type a move number and press Return
+to jump to it. Q quits.
+'''
+
+
+# Replay a recorded game on the game window.
+# path is a record.py file and game the number of the game in it, counting
+# 	from 0.
+# rate is how many moves a second are shown while playing.
+def view(path, game=0, rate=4.0):
+	for number, (won, codes) in enumerate(record.read_games(path)):
+		if number == game:
+			break
+	else:
+		raise ValueError(f'{path} has no game {game}')
+
+	open_window()
+	replay = record.Replay(codes)
+
+	with GW.batch():
+		draw_title()
+		grid_origin, pieces = draw_board(replay.state)
+		red_message, blue_message = draw_player_messages()
+
+		help_text = Text(Point(X_OFFSET + 500, 120), VIEWER_HELP)
+		help_text.draw(GW)
+		position_text = Text(Point(X_OFFSET, 580))
+		position_text.setSize(15)
+		position_text.draw(GW)
+
+	# Show the position replay is at.
+	def show():
+		state = replay.state
+		with GW.batch():
+			update_board(state.board, pieces)
+			swap_turn(not state.red_turn, red_message, blue_message)
+			position_text.setText(
+				f'Move {replay.index} of {len(replay)}, turn {state.turn_count}, at {rate:g} moves/s'
+			)
 
+	show()
+	playing = False
+	typed = ''
 
-	# The main game loop.
-	turn_count = 0
 	while True:
 
-		turn_count += 1
-
-		take_turn(red_turn, grid_origin, invalid_message, pieces)
-
-		if winner(pieces, red_message, blue_message, invalid_message, turn_count):
-			GW.getKey()
+		# Wait for a key while paused, but only look for one between moves
+		# 	while playing.
+		try:
+			key = GW.checkKey() if playing else GW.getKey()
+		except GraphicsError:
 			return
 
-		red_turn = swap_turn(red_turn, red_message, blue_message)
+		if key in ('q', 'Escape'):
+			GW.close()
+			return
+		elif key.isdigit():
+			typed += key
+			continue
+		elif key == 'Return' and typed:
+			replay.seek(int(typed))
+		elif key == 'space':
+			playing = not playing and replay.index < len(replay)
+		elif key in ('plus', 'equal', 'KP_Add'):
+			rate *= 2
+		elif key in ('minus', 'KP_Subtract'):
+			rate = max(0.25, rate / 2)
+		else:
+			step = {'Right': 1, 'Left': -1, 'Up': 10, 'Down': -10}.get(key)
+			if step:
+				replay.step(step)
+			elif key == 'Home':
+				replay.seek(0)
+			elif key == 'End':
+				replay.seek(len(replay))
+		if key:
+			typed = ''
+
+		if playing:
+			replay.step()
+			playing = replay.index < len(replay)
+			update(rate)
+
+		show()
 
 
 # Adds the game title to the game window.
@@ -185,6 +350,8 @@ def draw_rules():
 3. Winner is decided when all of the
     other player's pieces are removed 
     from the board.
+4. Press U to undo a move, and R to
+    redo it.
 		''')
 	how_to_play_text.draw(GW)
 
@@ -206,30 +373,35 @@ def draw_rules():
 
 
 # Adds the grid and the game pieces to the game window.
-def draw_board():
+# state is the GameState whose board is drawn.
+def draw_board(state):
 	y_offset = 90
 
 	pieces = []
 
-	for i in range(8):
-		column = []
+	# Everything is drawn in one batch, so the window is only updated once
+	# 	rather than after each of the squares and pieces.
+	with GW.batch():
+		for i in range(rules.WIDTH):
+			column = []
 
-		for j in range(8):
-			p1 = Point(X_OFFSET + (i * SQUARE_SIZE), y_offset + (j * SQUARE_SIZE))
-			p2 = Point(X_OFFSET + ((i + 1) * SQUARE_SIZE), y_offset + ((j + 1) * SQUARE_SIZE))
+			for j in range(rules.HEIGHT):
+				p1 = Point(X_OFFSET + (i * SQUARE_SIZE), y_offset + (j * SQUARE_SIZE))
+				p2 = Point(X_OFFSET + ((i + 1) * SQUARE_SIZE), y_offset + ((j + 1) * SQUARE_SIZE))
 			
-			square = Rectangle(p1, p2)
-			square.setFill(
-				color_rgb(240, 246, 237) if (i + j) % 2 == 0 else color_rgb(210, 231, 185)
-			)
-			square.setWidth(3)
-			square.draw(GW)
+				square = Rectangle(p1, p2)
+				square.setFill(
+					color_rgb(240, 246, 237) if (i + j) % 2 == 0 else color_rgb(210, 231, 185)
+				)
+				square.setWidth(3)
+				square.draw(GW)
 			
-			piece = Piece(p1, (i *8) + j, j + i)
-			column.append(piece)
+				name = rules.square(i, j)
+				color = state.board[name]
 
-		pieces.append(column)
-	
+				column.append(Piece(p1, name, color, square))
+
+			pieces.append(column)
 
 	return (X_OFFSET, y_offset), pieces
 
@@ -253,88 +425,192 @@ def draw_invalid_move_textbox():
 	return text
 
 
-# Main driver for each turn in the game.
-# player_turn is a boolean, where True indicates it is Red's turn and False
-# 	indicates Blue
-# grid_origin is a tuple with the true xy-coordinates on the game window where
-# 	the grid tiles start.
-# invalid_message is the textbox that tells if the players make an invalid move
-# pieces is a 2D array that stores the references to all the game pieces.
-def take_turn(player_turn, grid_origin, invalid_message, pieces):
-
-	player_color = RED if player_turn else BLUE
+# Plays a game by reacting to the window's events instead of waiting for them:
+# 	the mouse handler selects and moves the players' pieces, and the
+# 	computer's moves are scheduled on the Tk event loop. GW.run() returns once
+# 	the game is over.
+class Game():
+
+	# state is the GameState, which is updated once a valid move is made.
+	# grid_origin is a tuple with the true xy-coordinates on the game window
+	# 	where the grid tiles start.
+	# pieces is a 2D array that stores the references to all the game pieces.
+	# red_message, blue_message, and invalid_message are the message boxes
+	# 	for each player's turn and for invalid moves.
+	# computer is the color played by the computer and searcher the
+	# 	ai.Searcher that picks its moves.
+	def __init__(self, state, grid_origin, pieces, red_message, blue_message, invalid_message, computer, searcher):
+		self.state = state
+		self.grid_origin = grid_origin
+		self.pieces = pieces
+		self.red_message = red_message
+		self.blue_message = blue_message
+		self.invalid_message = invalid_message
+		self.computer = computer
+		self.searcher = searcher
+
+		# The location of the selected piece, if a player has selected one.
+		self.selected = None
+
+		# The squares each piece selected since the board last changed can
+		# 	move to, by location. end_turn empties it.
+		self.destinations = {}
+		self.over = False
+
+	# Start listening for clicks, and let the computer move if it goes first.
+	def start(self):
+		GW.setMouseHandler(self.click)
+		GW.setKeyHandler(self.key)
+		self.schedule_computer()
+
+	# Have the computer move next, once the window has redrawn, if it is the
+	# 	computer's turn.
+	def schedule_computer(self):
+		if self.state.player_color() == self.computer:
+			GW.after(1, self.computer_move)
+
+	# Everything a turn changes on the window is shown in a single update,
+	# 	here and in click and take_back.
+	def computer_move(self):
+		with GW.batch():
+			computer_turn(self.state, self.searcher, self.pieces)
+			self.end_turn()
+
+	# Handle a click on the game window.
+	def click(self, point):
+		if self.over or self.state.player_color() == self.computer:
+			return
 
-	while True:
-		
 		# Check to see if the player has clicked inside the grid.
-		starting_loc = valid_click(GW.getMouse(), grid_origin)
-		if starting_loc:
-			
-			# Clear the invalid move textbox.
-			invalid_message.clear()
-
-			# starting_piece is the piece the player wants to select.
-			starting_piece = pieces[starting_loc[0]][starting_loc[1]]
+		loc = valid_click(point, self.grid_origin)
+		if not loc:
+			return
 
-			# If the clicked piece's hidden flag is True, then that space is
-			# 	actually unoccupied and does not count as a selection.
-			if starting_piece.hidden:
-				continue
+		with GW.batch():
 
-			# If the starting piece is not that player's color, it belongs to
-			# 	the opponent and cannot count as a selection.
-			elif starting_piece.color != player_color:
-				invalid_message.update("That is not your piece.")
+			# Clear the invalid move textbox.
+			self.invalid_message.clear()
 
+			if self.selected is None:
+				self.select(loc)
 			else:
-				starting_piece.select()
+				self.move_to(loc)
 
-				while True:
+	# Select the piece at loc, if it belongs to the player.
+	def select(self, loc):
+		color = self.state.color_at(loc)
 
-					ending_loc = valid_click(GW.getMouse(), grid_origin)
-					if ending_loc:
-						
-						# Clear the invalid move textbox.
-						invalid_message.clear()
+		# If the clicked space is empty, it does not count as a selection.
+		if color == rules.EMPTY:
+			return
 
-						ending_piece = pieces[ending_loc[0]][ending_loc[1]]
+		# If the piece is not that player's color, it belongs to the opponent
+		# 	and cannot count as a selection.
+		elif color != self.state.player_color():
+			self.invalid_message.update("That is not your piece.")
 
+		else:
+			self.selected = loc
+			with GW.batch():
+				self.pieces[loc[0]][loc[1]].select()
+				for x, y in self.legal_destinations(loc):
+					self.pieces[x][y].highlight()
 
-						# Unselect the piece.
-						if ending_piece == starting_piece:
-							starting_piece.unselect()
-							break
+	# Unselect the selected piece, if there is one.
+	def unselect(self):
+		if self.selected is None:
+			return
+		x, y = self.selected
+		self.selected = None
+		with GW.batch():
+			self.pieces[x][y].unselect()
+			for x, y in self.legal_destinations((x, y)):
+				self.pieces[x][y].highlight(False)
+
+	# The set of locations the piece at loc can legally move to. It is worked
+	# 	out once for each piece and board, then reused.
+	def legal_destinations(self, loc):
+		if loc not in self.destinations:
+			mask = movegen.legal_destinations(rules.square(*loc), *movegen.sides(self.state))
+			self.destinations[loc] = {rules.coords(end) for end in squares(mask)}
+		return self.destinations[loc]
+
+	# Move the selected piece to loc.
+	def move_to(self, loc):
+		start = self.selected
+
+		# Unselect the piece.
+		if loc == start:
+			self.unselect()
+			return
 
-						
-						# Find all the local pieces that are killable.
-						killable_pieces = can_kill(starting_loc, player_color, pieces)
+		# The move is legal, so perform it.
+		if loc in self.legal_destinations(start):
+			self.unselect()
+			self.state.move(start, loc)
+			update_board(self.state.board, self.pieces)
+			self.end_turn()
+
+		# Otherwise only the rejected click pays for the rules check, to tell
+		# 	the player why.
+		else:
+			self.invalid_message.update(self.state.validate(start, loc))
+
+	# Handle a key press on the game window: U undoes a move and R redoes it.
+	def key(self, key):
+		if self.over or self.state.player_color() == self.computer:
+			return
+		if key in ('u', 'U'):
+			self.take_back(self.state.undo, self.state.history)
+		elif key in ('r', 'R'):
+			self.take_back(self.state.redo, self.state.undone)
+
+	# Undo or redo moves with step until it is a player's turn again, so
+	# 	against the computer its reply goes too, then show the position.
+	# moves is the list step takes from, which may run out.
+	def take_back(self, step, moves):
+		if not moves:
+			return
+		while moves:
+			step()
+			if self.state.player_color() != self.computer:
+				break
+
+		with GW.batch():
+			self.unselect()
+			self.invalid_message.clear()
+			update_board(self.state.board, self.pieces)
+			self.end_turn()
+
+	# Check for a winner, and otherwise hand the turn to the other player.
+	# Called whenever the board has changed.
+	def end_turn(self):
+		self.destinations.clear()
+		if winner(self.state, self.red_message, self.blue_message, self.invalid_message):
+			self.over = True
+			GW.setMouseHandler(None)
+			GW.setKeyHandler(None)
+			GW.stop()
+			return
 
-						# Check if the movement is orthogonal.
-						if not orthogonal(starting_loc, ending_loc):
-							invalid_message.update("Pieces can only move orthogonally.")
-						
-						# Check if the player is trying to take their own piece.
-						elif not ending_piece.hidden and starting_piece.color == ending_piece.color:
-							invalid_message.update("You cannot kill your own pieces.")
+		swap_turn(not self.state.red_turn, self.red_message, self.blue_message)
+		self.schedule_computer()
 
-						# Check if there are pieces in the way of the movement.
-						elif blocked(starting_loc, ending_loc, pieces):
-							invalid_message.update("There are other pieces in the way.")
 
-						# Check if there are killable pieces, and if the movement
-						# 	is to one of those pieces.
-						elif killable_pieces != [] and ending_piece.name not in killable_pieces:
-							invalid_message.update("That piece can kill another.")
+# Let the computer take its turn.
+# searcher is the ai.Searcher that picks the move.
+# pieces is a 2D array that stores the references to all the game pieces.
+def computer_turn(state, searcher, pieces):
 
-						# Check if the player is engaging an enemy piece
-						elif not_engaging(ending_loc, player_color, pieces):
-							invalid_message.update("Pieces must engage or kill another.")
+	move = ai.choose_move(state, searcher=searcher)
 
+	# With no legal moves, the computer has to pass.
+	if move is None:
+		state.pass_turn()
+		return
 
-						# Else, the move is valid so perform it.
-						else:
-							move_piece(starting_piece, ending_piece)
-							return
+	state.move(*move)
+	update_board(state.board, pieces)
 
 
 # Determines if the clicked location is on the game board.
@@ -342,10 +618,10 @@ def take_turn(player_turn, grid_origin, invalid_message, pieces):
 def valid_click(click_loc, origin_point):
 
 	min_x, min_y = origin_point
-	max_x = min_x + (8 * SQUARE_SIZE)
-	max_y = min_y + (8 * SQUARE_SIZE)
+	max_x = min_x + (rules.WIDTH * SQUARE_SIZE)
+	max_y = min_y + (rules.HEIGHT * SQUARE_SIZE)
 
-	if (min_x <= click_loc.x <= max_x) and (min_y <= click_loc.y <= max_y):
+	if (min_x <= click_loc.x < max_x) and (min_y <= click_loc.y < max_y):
 		return (
 			floor((click_loc.x - min_x) / SQUARE_SIZE),
 			floor((click_loc.y - min_y) / SQUARE_SIZE)
@@ -355,165 +631,34 @@ def valid_click(click_loc, origin_point):
 		open_new_tab("http://www.marksteeregames.com/Mad_Rooks_rules.pdf")
 
 
-# Determine if p1 is orthogonal to p2.
-# p1 and p2 are both tuples with xy-coordinates.
-def orthogonal(p1, p2):
-	return (p1[0] == p2[0]) or (p1[1] == p2[1])
-
-
-# Determine if there are any pieces in the way between p1 and p2.
-def blocked(p1, p2, board):
-
-	x_pointer, y_pointer = p1
-
-	# Check Upwards
-	if p2[1] < p1[1]:
-		while x_pointer > p2[0]:
-			x_pointer -= 1
-			if not board[x_pointer][y_pointer].hidden:
-				return True
-
-	# Check Downwards
-	elif p2[1] > p1[1]:
-		while x_pointer < p2[0]:
-			x_pointer += 1
-			if not board[x_pointer][y_pointer].hidden:
-				return True
-
-	# Check Leftwards
-	elif p2[0] < p1[0]: 
-		while y_pointer > p2[1]:
-			y_pointer -= 1
-			if not board[x_pointer][y_pointer].hidden:
-				return True
-
-	# Check Rightwards
-	else:
-		while y_pointer < p2[1]:
-			y_pointer += 1
-			if not board[x_pointer][y_pointer].hidden:
-				return True
-
-	return False
-
-
-# Find if the provided piece has anybody it can kill.
-# start is a tuple with the xy-coordinates of the piece to check.
-# player_color is the color of the player's piece
-# board is the 2D array of all game pieces.
-def can_kill(start, player_color, board):
-
-	# kills[] will be a list of the names of all the possible pieces to kill.
-	kills = []
-
-	# Check Up
-	up_kill = check_direction(start, player_color, board, 0, -1)
-
-	# Check Down
-	down_kill = check_direction(start, player_color, board, 0, 1)
-
-	# Check Left
-	left_kill = check_direction(start, player_color, board, -1, 0)
-
-	# Check Right
-	right_kill = check_direction(start, player_color, board, 1, 0)
-
-	# If any of the above returned something, add that piece's name to kills[].
-	if up_kill: kills.append(up_kill.name)
-	if down_kill: kills.append(down_kill.name)
-	if left_kill: kills.append(left_kill.name)
-	if right_kill: kills.append(right_kill.name)
-
-	return kills
-
-
-# Determine if a piece has anybody it can kill.
-# This is done through DFS recursion, because it is unknown how many empty
-# 	spaces there are between the piece and anybody it might kill.
-# start is the xy-coordinates of the piece.
-# start_color is the color of the original piece before to the recursion begins.
-# board is the 2D array of all game pieces.
-# x_dir and y_dir are two independent numbers in the range [-1, 1], and indicate
-# 	which direction the DFS searching will procede.
-def check_direction(start, start_color, board, x_dir, y_dir):
-
-	# The shifted coordinates to check
-	x_coord = start[0] + x_dir
-	y_coord = start[1] + y_dir
-
-	# If either coordinate of the tile is -1 or 9, it is out of bounds and
-	# 	should immediately return.
-	if -1 in [x_coord, y_coord] or 8 in [x_coord, y_coord]:
-		return
-
-	# The reference to the piece to be checked
-	check_loc = board[x_coord][y_coord]
-
-	# If the piece is not hidden, and it belongs to the opposing player, return
-	# 	it.
-	# Otherwise, return nothing since the piece already belongs to the player.
-	if not check_loc.hidden:
-		if check_loc.color != start_color:
-			return check_loc
-		return 
-
-	# Otherwise, there is not piece on the space, so recurse deeper from the new
-	# 	starting coordinates.
-	return check_direction((x_coord, y_coord), start_color, board, x_dir, y_dir)
-
-
-# Determine whether a piece if moved to the proposed location would be engaging
-# 	an enemy's piece for killing.
-# proposed_location is a tuple with xy-coordinates of where a piece wants to
-# 	move to.
-# player_color is the color of the piece that will be moved.
-# board is the 2D array of all game pieces.
-def not_engaging(proposed_location, player_color, board):
-
-	# First determine if the proposed space is empty.
-	# Then, if the piece can kill an opposing piece, via the transitive property
-	# 	that opposing piece will be able to kill the player's piece and thus is
-	# 	engaging it.
-	if board[proposed_location[0]][proposed_location[1]].hidden:
-		kills = can_kill(proposed_location, player_color, board)
-
-		if kills == []:
-			return True
-	return False
-
-
-# Move the piece by hiding it and recoloring the piece it would be taking.
-# start is a reference to the original piece.
-# end is a reference to the piece that will be "moved" to.
-def move_piece(start, end):
-	start.undraw()
-	end.change_color(start.color)
+# Bring the pieces on the game window up to date with a board, only touching
+# 	the squares whose color differs from what is shown.
+# board is a rules board and pieces the 2D array of Pieces showing it.
+def update_board(board, pieces):
+	with GW.batch():
+		for column in pieces:
+			for piece in column:
+				if piece.color != board[piece.name]:
+					piece.show(board[piece.name])
 
 
 # Determine if there are any winners.
-# board is the 2D array of all game pieces.
+# state is the GameState after the last move.
 # red_message, blue_message, and invalid_message are references to each player's
 # 	respective message box, as well as the box for telling if a move was
 # 	invalid.
-# turn_count is how many turns have already taken place.
-def winner(board, red_message, blue_message, invalid_message, turn_count):
-	red = 0
-	blue = 0
-	for column in board:
-		for item in column:
-			if not item.hidden:
-				if item.color == RED: red += 1
-				else: blue += 1
+def winner(state, red_message, blue_message, invalid_message):
+	won = state.winner()
 
 	# If both Red and Blue still have pieces left, return False.
-	if red > 0 and blue > 0:
+	if won is None:
 		return False
 
 	# Otherwise, change the message boxes to show who won, how many turns it
 	# 	took, and how to end the program.
 	else:
-		if red > 0: red_message.change_text(f' won after {turn_count} turns!')
-		else: blue_message.change_text(f' won after {turn_count} turns!')
+		if won == rules.RED: red_message.change_text(f' won after {state.turn_count} turns!')
+		else: blue_message.change_text(f' won after {state.turn_count} turns!')
 		invalid_message.update("Press any key to exit.", header=False)
 		return True
 
@@ -536,9 +681,30 @@ def swap_turn(turn, red, blue):
 
 
 if __name__ == '__main__':
+	parser = ArgumentParser(description='Play Mad Rooks.')
+	parser.add_argument('--computer', choices=['red', 'blue'], help='let the computer play this color')
+	parser.add_argument('--think', type=float, default=1.0, help='seconds the computer may take per move')
+	parser.add_argument('--record', default=RECORD_PATH, help='game record file to append the game to')
+	parser.add_argument('--no-record', dest='record', action='store_const', const=None, help='do not record the game')
+	parser.add_argument('--database', help='game database directory to add the game to')
+	parser.add_argument('--book', help='opening book for the computer, built with book.py')
+	parser.add_argument('--size', type=rules.parse_size, default=(rules.WIDTH, rules.HEIGHT), help='board size, WxH; only 8x8 games are recorded')
+	parser.add_argument('--debug', action='store_true', help='check the piece counts against the board after every move')
+	parser.add_argument('--replay', metavar='FILE', help='watch a game from a game record file instead of playing')
+	parser.add_argument('--game', type=int, default=0, help='which game in the --replay file to watch, from 0')
+	parser.add_argument('--rate', type=float, default=4.0, help='moves a second when playing a replay')
+	args = parser.parse_args()
+
+	computer = {'red': rules.RED, 'blue': rules.BLUE}.get(args.computer)
+	rules.set_size(*args.size)
+	rules.DEBUG = args.debug
+
 	print('\n\033[92mRunning main.py\n\033[0m')
 	try:
-		main()
+		if args.replay:
+			view(args.replay, args.game, args.rate)
+		else:
+			main(computer, args.think, args.record, args.database, args.book)
 
 	except Exception as e:
 		print(f'\033[91m{e}\033[0m')
\ No newline at end of file
@@ -0,0 +1,240 @@
+# mcts.py
+
+# A Monte Carlo Tree Search (UCT) computer player for Mad Rooks.
+# Positions are the bitboards from bitboard.py and the random playouts use the
+# 	move generator in movegen.py, so nothing here touches graphics.py. With
+# 	more than one worker, every worker process grows its own tree from the
+# 	same root for the whole time budget, and the root moves' visit counts are
+# 	added together to pick the move (root parallelism).
+# With NumPy installed, each new node can instead be scored by a bulk of
+# 	playouts played together by batch.py.
+
+from math import log, sqrt
+from random import Random
+from time import perf_counter
+
+import rules
+from movegen import generate, move_array, decode_move, sides
+from ai import make_move
+
+try:
+	import batch
+except ImportError:
+	batch = None
+
+# The results of a playout, for the player to move when it started.
+WIN = 1.0
+DRAW = 0.5
+LOSS = 0.0
+
+# Playouts longer than this are called a draw. Random games from the starting
+# 	board take around 80 moves.
+MAX_PLAYOUT = 400
+
+
+# Play random legal moves until the game ends.
+# Returns WIN, LOSS or DRAW for the player with the pieces in own.
+def playout(own, enemy, rng, max_plies=MAX_PLAYOUT):
+	mover = 0
+	for _ in range(max_plies):
+
+		# The previous move took the last piece of the player to move.
+		if not own:
+			return LOSS if mover == 0 else WIN
+
+		moves = move_array(own, enemy)
+		if moves:
+			start, end = decode_move(moves[rng.randrange(len(moves))])
+			end_bit = 1 << end
+			own, enemy = enemy & ~end_bit, own ^ (1 << start) | end_bit
+
+		# A player with no legal moves passes, unless neither can move.
+		elif any(True for _ in generate(enemy, own)):
+			own, enemy = enemy, own
+
+		else:
+			return DRAW
+
+		mover ^= 1
+
+	return DRAW
+
+
+# A position in the search tree.
+# wins and visits are counted for the player who made move, which is the one
+# 	choosing between this node and its siblings.
+class Node():
+
+	__slots__ = ('own', 'enemy', 'move', 'parent', 'children', 'untried', 'visits', 'wins')
+
+	def __init__(self, own, enemy, move=None, parent=None):
+		self.own = own
+		self.enemy = enemy
+		self.move = move
+		self.parent = parent
+		self.children = []
+		self.visits = 0
+		self.wins = 0.0
+
+		# The moves that do not have a child yet. A player with no legal moves
+		# 	has a single pass (None), and a finished game has none at all.
+		if own and enemy:
+			self.untried = list(generate(own, enemy))
+			if not self.untried and any(True for _ in generate(enemy, own)):
+				self.untried = [None]
+		else:
+			self.untried = []
+
+	# Pick the child with the best UCT score.
+	def select(self, exploration):
+		scale = exploration * sqrt(log(self.visits))
+		return max(
+			self.children,
+			key=lambda child: child.wins / child.visits + scale / sqrt(child.visits)
+		)
+
+	# Add a child for one of the untried moves, chosen at random.
+	def expand(self, rng):
+		move = self.untried.pop(rng.randrange(len(self.untried)))
+		if move is None:
+			child = Node(self.enemy, self.own, None, self)
+		else:
+			child = Node(*make_move(self.own, self.enemy, move), move, self)
+		self.children.append(child)
+		return child
+
+
+# Grow one tree from (own, enemy) for time_limit seconds.
+# rollouts is how many playouts score each new node. More than one needs
+# 	batch.py, and the node is scored by the average result.
+# Returns ({move: (visits, wins)} for the root's children, playouts, tree size).
+def grow_tree(own, enemy, time_limit, exploration, seed, rollouts=1):
+	rng = Random(seed)
+	root = Node(own, enemy)
+	deadline = perf_counter() + time_limit
+	playouts = 0
+	size = 1
+
+	# A single legal move needs no thought.
+	while perf_counter() < deadline and len(root.untried) + len(root.children) > 1:
+
+		# Walk down the fully expanded part of the tree, then add one node.
+		node = root
+		while not node.untried and node.children:
+			node = node.select(exploration)
+		if node.untried:
+			node = node.expand(rng)
+			size += 1
+
+		if rollouts > 1 and node.own and node.enemy:
+			wins, _, draws = batch.rollouts(node.own, node.enemy, rollouts, rng.getrandbits(32))
+			result = (wins + draws * DRAW) / rollouts
+			playouts += rollouts
+		else:
+			result = playout(node.own, node.enemy, rng)
+			playouts += 1
+
+		# The node's wins count for the player who moved into it, who is the
+		# 	opponent of the player the playout result is for.
+		while node is not None:
+			node.visits += 1
+			node.wins += 1.0 - result
+			result = 1.0 - result
+			node = node.parent
+
+	moves = {child.move: (child.visits, child.wins) for child in root.children}
+	for move in root.untried:
+		moves[move] = (0, 0.0)
+	return moves, playouts, size
+
+
+# Unpack the arguments for grow_tree in a worker process.
+def _grow_tree(args):
+	return grow_tree(*args)
+
+
+class MCTSPlayer():
+
+	# workers is the number of processes growing trees. With one, the tree
+	# 	is grown in this process and no pool is started.
+	# rollouts is how many playouts score each new node, see grow_tree.
+	def __init__(self, time_limit=1.0, workers=1, exploration=1.4, seed=None, rollouts=1):
+		if rollouts > 1 and batch is None:
+			raise ImportError('batch rollouts need NumPy 2.0 or later')
+
+		self.time_limit = time_limit
+		self.workers = workers
+		self.exploration = exploration
+		self.rollouts = rollouts
+		self.rng = Random(seed)
+		self.pool = None
+
+		# Statistics about the last search.
+		self.playouts = 0
+		self.nodes = 0
+		self.elapsed = 0.0
+
+	# Playouts per second in the last search, over all workers.
+	def playout_rate(self):
+		return self.playouts / self.elapsed if self.elapsed else 0.0
+
+	# Find the best move for the player with the pieces in own.
+	# Returns a (start, end) pair of board indexes, or None if the player has
+	# 	to pass.
+	def search(self, own, enemy):
+		start_time = perf_counter()
+		jobs = [
+			(own, enemy, self.time_limit, self.exploration, self.rng.getrandbits(64), self.rollouts)
+			for _ in range(self.workers)
+		]
+
+		if self.workers > 1:
+			if self.pool is None:
+				self.pool = rules.worker_pool(self.workers)
+			results = self.pool.map(_grow_tree, jobs)
+		else:
+			results = [grow_tree(*jobs[0])]
+
+		visits = {}
+		self.playouts = 0
+		self.nodes = 0
+		for moves, playouts, size in results:
+			self.playouts += playouts
+			self.nodes += size
+			for move, (count, _) in moves.items():
+				visits[move] = visits.get(move, 0) + count
+
+		self.elapsed = perf_counter() - start_time
+		if not visits:
+			return None
+		return max(visits, key=visits.get)
+
+	# Stop the worker processes.
+	def close(self):
+		if self.pool is not None:
+			self.pool.close()
+			self.pool.join()
+			self.pool = None
+
+
+# Choose a move for the player whose turn it is in a GameState, like
+# 	ai.choose_move.
+# Returns a pair of xy-coordinate tuples, or None if the player has to pass.
+def choose_move(state, time_limit=1.0, player=None):
+	player = MCTSPlayer(time_limit) if player is None else player
+	move = player.search(*sides(state))
+	if move is None:
+		return None
+	return rules.coords(move[0]), rules.coords(move[1])
+
+
+if __name__ == '__main__':
+	from os import cpu_count
+
+	player = MCTSPlayer(2.0, workers=cpu_count() or 1)
+	move = choose_move(rules.GameState(), player=player)
+	player.close()
+
+	print(f'Best first move: {move}')
+	print(f'{player.playouts} playouts in {player.elapsed:.2f}s ({player.playout_rate():.0f} games/s)')
+	print(f'{player.nodes} tree nodes over {player.workers} workers')
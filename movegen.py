@@ -0,0 +1,87 @@
+# movegen.py
+
+# Enumerates every legal move for the player whose turn it is.
+# A move is legal exactly when rules.validate_move accepts it, which boils down
+# 	to one of two cases for each of the player's pieces:
+# 	- If the piece can kill anybody (can_kill), it must move onto one of
+# 		those pieces.
+# 	- Otherwise it may slide to any empty square it can reach, as long as it
+# 		would be engaging an enemy piece from there (not_engaging). The moving
+# 		piece is still on its starting square for that check.
+
+from array import array
+
+import rules
+from bitboard import squares, hits, reach, from_board
+
+# Moves in the bulk format are packed into one integer: start << SQUARE_BITS
+# 	| end. Up to 64 squares that is 12 bits, the same as a record.py code, and
+# 	the arrays hold 16-bit items; larger boards take 8 bits a square and 32-bit
+# 	items.
+def _resize():
+	global SQUARE_BITS, SQUARE_MASK, MOVE_TYPECODE
+	SQUARE_BITS = 6 if rules.CELLS <= 64 else 8
+	SQUARE_MASK = (1 << SQUARE_BITS) - 1
+	MOVE_TYPECODE = 'H' if SQUARE_BITS == 6 else 'I'
+
+rules.on_resize(_resize)
+
+
+# Pack a move from start to end (board indexes) into one integer.
+def encode_move(start, end):
+	return start << SQUARE_BITS | end
+
+
+# Unpack a move created by encode_move into its (start, end) board indexes.
+def decode_move(move):
+	return move >> SQUARE_BITS, move & SQUARE_MASK
+
+
+# Find the mask of every square the piece on index can legally move to.
+# own and enemy are the bitboards of the moving player and their opponent.
+def legal_destinations(index, own, enemy):
+	occupied = own | enemy
+
+	# Forced capture: the piece has to kill one of the pieces it can see.
+	kills = hits(index, occupied) & enemy
+	if kills:
+		return kills
+
+	# Otherwise only the empty squares it would engage an enemy from.
+	destinations = 0
+	for end in squares(reach(index, occupied)):
+		if hits(end, occupied) & enemy:
+			destinations |= 1 << end
+	return destinations
+
+
+# Lazily yield every legal move as a (start, end) pair of board indexes.
+# Moves are generated piece by piece, so a search can stop early without
+# 	paying for the rest.
+def generate(own, enemy):
+	for start in squares(own):
+		for end in squares(legal_destinations(start, own, enemy)):
+			yield start, end
+
+
+# Collect every legal move into a compact array of encoded moves.
+def move_array(own, enemy):
+	moves = array(MOVE_TYPECODE)
+	for start in squares(own):
+		high = start << SQUARE_BITS
+		moves.extend(high | end for end in squares(legal_destinations(start, own, enemy)))
+	return moves
+
+
+# Split a GameState into the bitboards of the player to move and their
+# 	opponent.
+def sides(state):
+	red, blue = from_board(state.board)
+	return (red, blue) if state.red_turn else (blue, red)
+
+
+# Lazily yield every legal move in a GameState as a pair of xy-coordinate
+# 	tuples, ready for GameState.move.
+def legal_moves(state):
+	for start, end in generate(*sides(state)):
+		yield rules.coords(start), rules.coords(end)
@@ -0,0 +1,503 @@
+# offscreen.py
+
+# A stand-in for graphics.GraphWin that needs neither Tk nor a display.
+# Objects from graphics.py draw into an OffscreenWin exactly as they would into
+# 	a GraphWin, but the canvas items are only kept as a scene in memory: the
+# 	kind of each item, its coordinates and its options, in stacking order.
+# 	The scene can then be rasterised in pure Python and written out as a PNG.
+# The rasteriser handles rectangles, ovals, lines and polygons, with their fill
+# 	and outline colors and outline widths. Text and images are kept in the
+# 	scene but not rasterised, since there is no font renderer to draw them.
+# There is no event loop either: after only queues its calls, and run makes
+# 	them in order until stop is called, so main.Game can play in one.
+# Usage: python offscreen.py RECORD_FILE DIRECTORY [--scale S] [--positions]
+# 	renders the final board of every game in a record.py file, or every
+# 	position with --positions, to PNG files in DIRECTORY.
+
+from contextlib import contextmanager
+from math import ceil, sqrt
+from struct import pack
+from zlib import compress, crc32
+
+from graphics import GraphWin, GraphicsError
+
+# The background of a canvas that has not been given one, as on Tk for X11.
+DEFAULT_BACKGROUND = '#d9d9d9'
+
+# The named colors that can be rasterised, on top of '#rgb' and '#rrggbb'.
+NAMED_COLORS = {
+	'black': (0, 0, 0),
+	'white': (255, 255, 255),
+	'gray': (190, 190, 190),
+	'grey': (190, 190, 190),
+	'red': (255, 0, 0),
+	'green': (0, 255, 0),
+	'blue': (0, 0, 255),
+	'yellow': (255, 255, 0),
+	'cyan': (0, 255, 255),
+	'magenta': (255, 0, 255),
+	'orange': (255, 165, 0),
+	'purple': (160, 32, 240),
+	'brown': (165, 42, 42),
+	'pink': (255, 192, 203),
+	'gold': (255, 215, 0),
+	'lemonchiffon': (255, 250, 205),
+	'lightgray': (211, 211, 211),
+	'lightgrey': (211, 211, 211),
+	'darkgray': (169, 169, 169),
+	'darkgrey': (169, 169, 169),
+}
+
+
+# Turn a Tk color into 3 bytes of RGB, or None for no color ('').
+def parse_color(color):
+	if not color:
+		return None
+	if color.startswith('#'):
+		digits = color[1:]
+		if len(digits) == 3:
+			digits = ''.join(digit * 2 for digit in digits)
+		if len(digits) != 6:
+			raise GraphicsError(f'Unknown color: {color}')
+		return bytes.fromhex(digits)
+	try:
+		return bytes(NAMED_COLORS[color.lower().replace(' ', '')])
+	except KeyError:
+		raise GraphicsError(f'Unknown color: {color}') from None
+
+
+# Pack rows of RGB bytes into a PNG file.
+def png_bytes(width, height, rows):
+	def chunk(tag, data):
+		return pack('>I', len(data)) + tag + data + pack('>I', crc32(tag + data))
+
+	raw = b''.join(b'\x00' + bytes(row) for row in rows)
+	return (
+		b'\x89PNG\r\n\x1a\n'
+		+ chunk(b'IHDR', pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+		+ chunk(b'IDAT', compress(raw, 6))
+		+ chunk(b'IEND', b'')
+	)
+
+
+# A canvas being rasterised: one bytearray of RGB values per pixel row.
+class Raster():
+
+	def __init__(self, width, height, background):
+		self.width = width
+		self.height = height
+		self.rows = [bytearray(background * width) for _ in range(height)]
+
+	# The pixel rows or columns whose centers lie between low and high.
+	@staticmethod
+	def _pixels(low, high, limit):
+		return max(0, ceil(low - 0.5)), min(limit, ceil(high - 0.5))
+
+	# Paint the pixels of row y from x1 to x2.
+	def span(self, y, x1, x2, color):
+		start, end = self._pixels(x1, x2, self.width)
+		if start < end:
+			self.rows[y][start * 3:end * 3] = color * (end - start)
+
+	def rectangle(self, x1, y1, x2, y2, color):
+		top, bottom = self._pixels(y1, y2, self.height)
+		start, end = self._pixels(x1, x2, self.width)
+		if start < end:
+			pixels = color * (end - start)
+			for row in self.rows[top:bottom]:
+				row[start * 3:end * 3] = pixels
+
+	# Paint an ellipse, or the ring between it and an inner ellipse.
+	# inner is the inner ellipse's radii, or None for a solid ellipse.
+	def ellipse(self, cx, cy, rx, ry, color, inner=None):
+		if rx <= 0 or ry <= 0:
+			return
+		inner_rx, inner_ry = inner or (0, 0)
+		hollow = inner_rx > 0 and inner_ry > 0
+		rows = self.rows
+		width = self.width
+
+		top, bottom = self._pixels(cy - ry, cy + ry, self.height)
+		for y in range(top, bottom):
+			offset = y + 0.5 - cy
+			dy = offset / ry
+			if dy * dy >= 1:
+				continue
+			half = rx * sqrt(1 - dy * dy)
+			start = max(0, ceil(cx - half - 0.5))
+			end = min(width, ceil(cx + half - 0.5))
+			if start >= end:
+				continue
+			row = rows[y]
+
+			# Leave out the part of the row inside the inner ellipse.
+			if hollow and abs(offset) < inner_ry:
+				inner_dy = offset / inner_ry
+				inner_half = inner_rx * sqrt(1 - inner_dy * inner_dy)
+				hole_start = max(start, ceil(cx - inner_half - 0.5))
+				hole_end = min(end, ceil(cx + inner_half - 0.5))
+				if hole_start < hole_end:
+					row[start * 3:hole_start * 3] = color * (hole_start - start)
+					row[hole_end * 3:end * 3] = color * (end - hole_end)
+					continue
+
+			row[start * 3:end * 3] = color * (end - start)
+
+	# Fill a polygon given as a flat list of coordinates, even-odd.
+	def polygon(self, coords, color):
+		points = list(zip(coords[::2], coords[1::2]))
+		edges = list(zip(points, points[1:] + points[:1]))
+		ys = [y for _, y in points]
+		top, bottom = self._pixels(min(ys), max(ys), self.height)
+
+		for y in range(top, bottom):
+			center = y + 0.5
+			crossings = sorted(
+				x1 + (center - y1) * (x2 - x1) / (y2 - y1)
+				for (x1, y1), (x2, y2) in edges
+				if (y1 <= center) != (y2 <= center)
+			)
+			for left, right in zip(crossings[::2], crossings[1::2]):
+				self.span(y, left, right, color)
+
+	# Paint a line of the given width, as a rectangle around it.
+	def line(self, x1, y1, x2, y2, width, color):
+		dx = x2 - x1
+		dy = y2 - y1
+		length = sqrt(dx * dx + dy * dy)
+		if not length:
+			self.rectangle(x1 - width / 2, y1 - width / 2, x1 + width / 2, y1 + width / 2, color)
+			return
+		nx = -dy / length * width / 2
+		ny = dx / length * width / 2
+		self.polygon([x1 + nx, y1 + ny, x2 + nx, y2 + ny, x2 - nx, y2 - ny, x1 - nx, y1 - ny], color)
+
+	def png(self):
+		return png_bytes(self.width, self.height, self.rows)
+
+
+class OffscreenWin():
+
+	"""A GraphWin that records what is drawn into it instead of showing it"""
+
+	def __init__(self, title="Graphics Window", width=200, height=200, autoflush=False):
+		self.title = title
+		self.width = int(width)
+		self.height = int(height)
+		self.background = DEFAULT_BACKGROUND
+		self.foreground = "black"
+		self.trans = None
+		self.closed = False
+
+		# There is no event loop to flush, so drawn objects never try to.
+		self.autoflush = False
+
+		# The drawn objects by id, like GraphWin.items.
+		self.items = {}
+
+		# The canvas items by id, in stacking order (bottom first): each one is
+		# 	[kind, coordinates, options].
+		self.scene = {}
+		self._nextId = 1
+
+		self._mouseCallback = None
+		self._keyCallback = None
+
+		# The calls scheduled with after, in order: (id, function, args).
+		self._pending = []
+		self._nextAfter = 1
+		self._running = False
+
+	def __repr__(self):
+		if self.isClosed():
+			return "<Closed OffscreenWin>"
+		return "OffscreenWin('{}', {}, {})".format(self.title, self.width, self.height)
+
+	# The parts of GraphWin that only keep track of things work unchanged.
+	__str__ = GraphWin.__str__
+	setCoords = GraphWin.setCoords
+	isClosed = GraphWin.isClosed
+	isOpen = GraphWin.isOpen
+	getHeight = GraphWin.getHeight
+	getWidth = GraphWin.getWidth
+	toScreen = GraphWin.toScreen
+	toWorld = GraphWin.toWorld
+	setMouseHandler = GraphWin.setMouseHandler
+	setKeyHandler = GraphWin.setKeyHandler
+	addItem = GraphWin.addItem
+	delItem = GraphWin.delItem
+	redraw = GraphWin.redraw
+	clear = GraphWin.clear
+
+	def setBackground(self, color):
+		"""Set background color of the window"""
+		self.background = color
+
+	def close(self):
+		"""Close the window"""
+		self.closed = True
+
+	def plot(self, x, y, color="black"):
+		"""Set pixel (x,y) to the given color"""
+		xs,ys = self.toScreen(x,y)
+		self.create_line(xs,ys,xs+1,ys, fill=color)
+
+	def plotPixel(self, x, y, color="black"):
+		"""Set pixel raw (independent of window coordinates) pixel
+		(x,y) to color"""
+		self.create_line(x,y,x+1,y, fill=color)
+
+	def flush(self):
+		"""Nothing to update"""
+
+	def update(self):
+		"""Nothing to update"""
+
+	@contextmanager
+	def batch(self):
+		"""Nothing to batch, since nothing is ever flushed"""
+		yield self
+
+	def after(self, ms, func, *args):
+		"""Schedule func(*args) for run(). There is no clock, so calls run
+		in the order they were scheduled, whatever their delay"""
+		after_id = f'after#{self._nextAfter}'
+		self._nextAfter += 1
+		self._pending.append((after_id, func, args))
+		return after_id
+
+	def after_cancel(self, after_id):
+		"""Cancel a call scheduled with after"""
+		self._pending = [call for call in self._pending if call[0] != after_id]
+
+	def run(self):
+		"""Make the scheduled calls, and any they schedule in turn, until
+		stop() is called, the window is closed or nothing is left to do.
+		There are no clicks or key presses to wait for: those can be sent
+		to the handlers directly, then run() called again"""
+		self._running = True
+		while self._running and not self.isClosed() and self._pending:
+			_, func, args = self._pending.pop(0)
+			func(*args)
+		self._running = False
+
+	def stop(self):
+		"""Make run() return once the current call is done"""
+		self._running = False
+
+	def getMouse(self):
+		raise GraphicsError("getMouse in offscreen window")
+
+	def checkMouse(self):
+		return None
+
+	def getKey(self):
+		raise GraphicsError("getKey in offscreen window")
+
+	def checkKey(self):
+		return ""
+
+	# The Tk canvas methods that graphics.py objects call.
+
+	def _create(self, kind, args, options):
+		args = list(args)
+		config = dict(args.pop()) if args and isinstance(args[-1], dict) else {}
+		config.update(options)
+		if len(args) == 1:
+			args = list(args[0])
+		item = self._nextId
+		self._nextId += 1
+		self.scene[item] = [kind, [float(value) for value in args], config]
+		return item
+
+	def create_rectangle(self, *args, **options):
+		return self._create('rectangle', args, options)
+
+	def create_oval(self, *args, **options):
+		return self._create('oval', args, options)
+
+	def create_line(self, *args, **options):
+		return self._create('line', args, options)
+
+	def create_polygon(self, *args, **options):
+		return self._create('polygon', args, options)
+
+	def create_text(self, *args, **options):
+		return self._create('text', args, options)
+
+	def create_image(self, *args, **options):
+		return self._create('image', args, options)
+
+	def delete(self, item):
+		self.scene.pop(item, None)
+
+	def itemconfig(self, item, options=None, **more):
+		config = self.scene[item][2]
+		config.update(options or {})
+		config.update(more)
+
+	def move(self, item, dx, dy):
+		coords = self.scene[item][1]
+		for index in range(0, len(coords), 2):
+			coords[index] += dx
+			coords[index + 1] += dy
+
+	def coords(self, item):
+		return list(self.scene[item][1])
+
+	# Put item just above other, or on top of everything.
+	def lift(self, item, other=None):
+		entry = self.scene.pop(item)
+		if other is None:
+			self.scene[item] = entry
+		else:
+			self._insert(item, entry, other, after=True)
+
+	# Put item just below other, or under everything.
+	def lower(self, item, other=None):
+		entry = self.scene.pop(item)
+		if other is None:
+			self.scene = {item: entry, **self.scene}
+		else:
+			self._insert(item, entry, other, after=False)
+
+	def _insert(self, item, entry, other, after):
+		scene = {}
+		for key, value in self.scene.items():
+			if key == other and not after:
+				scene[item] = entry
+			scene[key] = value
+			if key == other and after:
+				scene[item] = entry
+		self.scene = scene
+
+	# Rasterising.
+
+	def render(self, scale=1.0, box=None):
+		"""Rasterise the scene, scaled by scale, and return a Raster. box
+		is an optional (x1, y1, x2, y2) part of the window to keep"""
+		left, top, right, bottom = box or (0, 0, self.width, self.height)
+		raster = Raster(
+			max(1, round((right - left) * scale)),
+			max(1, round((bottom - top) * scale)),
+			parse_color(self.background) or b'\xff\xff\xff'
+		)
+
+		for kind, coords, options in self.scene.values():
+			points = [
+				(value - (left if index % 2 == 0 else top)) * scale
+				for index, value in enumerate(coords)
+			]
+			width = float(options.get('width', 1)) * scale
+			fill = parse_color(options.get('fill', ''))
+			outline = parse_color(options.get('outline', ''))
+
+			if kind == 'rectangle':
+				x1, y1, x2, y2 = points
+				x1, x2 = sorted((x1, x2))
+				y1, y2 = sorted((y1, y2))
+				if fill:
+					raster.rectangle(x1, y1, x2, y2, fill)
+				if outline and width > 0:
+					half = width / 2
+					raster.rectangle(x1 - half, y1 - half, x2 + half, y1 + half, outline)
+					raster.rectangle(x1 - half, y2 - half, x2 + half, y2 + half, outline)
+					raster.rectangle(x1 - half, y1 + half, x1 + half, y2 - half, outline)
+					raster.rectangle(x2 - half, y1 + half, x2 + half, y2 - half, outline)
+
+			elif kind == 'oval':
+				x1, y1, x2, y2 = points
+				cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+				rx, ry = abs(x2 - x1) / 2, abs(y2 - y1) / 2
+				half = width / 2 if outline else 0
+				if fill:
+					raster.ellipse(cx, cy, rx - half, ry - half, fill)
+				if outline and width > 0:
+					raster.ellipse(cx, cy, rx + half, ry + half, outline, (rx - half, ry - half))
+
+			elif kind == 'line':
+				for index in range(0, len(points) - 2, 2):
+					if fill:
+						raster.line(*points[index:index + 4], max(width, scale), fill)
+
+			elif kind == 'polygon':
+				if fill:
+					raster.polygon(points, fill)
+				if outline and width > 0:
+					closed = points + points[:2]
+					for index in range(0, len(closed) - 2, 2):
+						raster.line(*closed[index:index + 4], width, outline)
+
+		return raster
+
+	def savePNG(self, filename, scale=1.0, box=None):
+		"""Rasterise the scene (see render) and save it as a PNG file"""
+		with open(filename, 'wb') as file:
+			file.write(self.render(scale, box).png())
+
+
+# Draw a game position the way main.py does, into an OffscreenWin.
+# state is a rules.GameState.
+# main.py draws into its own window, so it is only lent this one for the board
+# 	and gets back whatever window it had.
+# Returns the window.
+def draw_position(state):
+	import main
+
+	window = OffscreenWin('Mad Rooks', 1000, 615)
+	previous = main.GW
+	try:
+		main.open_window(window)
+		main.draw_board(state)
+	finally:
+		main.GW = previous
+	return window
+
+
+def main():
+	from argparse import ArgumentParser
+	from pathlib import Path
+	from time import perf_counter
+
+	import rules
+	import record
+	import main as game
+
+	parser = ArgumentParser(description='Render Mad Rooks games to PNG files without a display.')
+	parser.add_argument('record', help='a game record file')
+	parser.add_argument('directory')
+	parser.add_argument('--scale', type=float, default=0.25)
+	parser.add_argument('--positions', action='store_true', help='render every position rather than only the last')
+	args = parser.parse_args()
+
+	directory = Path(args.directory)
+	directory.mkdir(parents=True, exist_ok=True)
+
+	# Only the board is kept.
+	left, top = game.X_OFFSET, 90
+	box = (
+		left - 2, top - 2,
+		left + rules.WIDTH * game.SQUARE_SIZE + 2, top + rules.HEIGHT * game.SQUARE_SIZE + 2
+	)
+
+	count = 0
+	start = perf_counter()
+	for number, (_, codes) in enumerate(record.read_games(args.record)):
+		states = record.replay(codes)
+		if not args.positions:
+			state = rules.GameState()
+			for state in states:
+				pass
+			states = [state]
+
+		for state in states:
+			path = directory / f'game{number:05d}-{len(state.history):04d}.png'
+			draw_position(state).savePNG(path, args.scale, box)
+			count += 1
+
+	elapsed = perf_counter() - start
+	print(f'{count} boards in {elapsed:.2f}s ({count / elapsed:,.0f} boards/s)')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,124 @@
+# perft.py
+
+# Counts every sequence of legal moves from the starting board, which is both
+# 	a correctness check for the move generator (the counts must never change
+# 	unless the rules do) and a benchmark for it (nodes per second).
+# Usage: python perft.py DEPTH [--divide] [--check] [--size WxH]
+
+from argparse import ArgumentParser
+from time import perf_counter
+
+import rules
+from movegen import generate, legal_destinations, legal_moves, sides
+from bitboard import squares
+
+
+# Count the leaf positions depth moves below the position given by the
+# 	bitboards of the player to move (own) and their opponent (enemy).
+# A game that has been won has no moves left, so it stops counting there.
+def perft_bits(own, enemy, depth):
+	if depth == 0:
+		return 1
+
+	# At the last level every legal move is a leaf, so only count them.
+	if depth == 1:
+		return sum(legal_destinations(start, own, enemy).bit_count() for start in squares(own))
+
+	nodes = 0
+	for start, end in generate(own, enemy):
+		end_bit = 1 << end
+		moved = own ^ (1 << start) | end_bit
+		nodes += perft_bits(enemy & ~end_bit, moved, depth - 1)
+	return nodes
+
+
+# Count the leaf positions depth moves below a GameState.
+def perft(depth, state=None):
+	state = rules.GameState() if state is None else state
+	return perft_bits(*sides(state), depth)
+
+
+# The same count, but found the slow way: by asking rules.validate_move about
+# 	every orthogonal (start, end) pair, like the GUI does for each click.
+def legacy_perft(state, depth):
+	if depth == 0:
+		return 1
+
+	nodes = 0
+	for start, end in list(legacy_moves(state)):
+		state.move(start, end)
+		nodes += legacy_perft(state, depth - 1)
+		state.unmake()
+	return nodes
+
+
+# Yield every move in state that rules.validate_move accepts.
+def legacy_moves(state):
+	player_color = state.player_color()
+	for index, color in enumerate(state.board):
+		if color != player_color:
+			continue
+
+		x, y = start = rules.coords(index)
+		column = ((x, j) for j in range(rules.HEIGHT))
+		row = ((i, y) for i in range(rules.WIDTH))
+		for end in (*column, *row):
+			if end != start and state.validate(start, end) is None:
+				yield start, end
+
+
+# Count the leaves below each root move separately.
+# Returns a list of ((start, end), nodes) pairs, with xy-coordinate moves.
+def divide(depth, state=None):
+	state = rules.GameState() if state is None else state
+	results = []
+	for start, end in list(legal_moves(state)):
+		state.move(start, end)
+		results.append(((start, end), perft(depth - 1, state)))
+		state.unmake()
+	return results
+
+
+# Format an xy-coordinate move for printing.
+def move_text(move):
+	(x1, y1), (x2, y2) = move
+	return f'{x1},{y1}-{x2},{y2}'
+
+
+def main():
+	parser = ArgumentParser(description='Count Mad Rooks move paths from the starting board.')
+	parser.add_argument('depth', type=int)
+	parser.add_argument('--divide', action='store_true', help='print the count below each first move')
+	parser.add_argument('--check', action='store_true', help='repeat the count with rules.validate_move')
+	parser.add_argument('--size', type=rules.parse_size, default=(rules.WIDTH, rules.HEIGHT), help='board size, WxH')
+	args = parser.parse_args()
+
+	rules.set_size(*args.size)
+
+	state = rules.GameState()
+
+	start = perf_counter()
+	if args.divide and args.depth > 0:
+		results = divide(args.depth, state)
+		for move, count in results:
+			print(f'{move_text(move)}: {count}')
+		nodes = sum(count for _, count in results)
+	else:
+		nodes = perft(args.depth, state)
+	elapsed = perf_counter() - start
+
+	print(f'\nDepth {args.depth}: {nodes} nodes in {elapsed:.3f}s ({nodes / max(elapsed, 1e-9):,.0f} nodes/s)')
+
+	if args.check:
+		start = perf_counter()
+		legacy_nodes = legacy_perft(state, args.depth)
+		elapsed = perf_counter() - start
+		print(f'rules.py:  {legacy_nodes} nodes in {elapsed:.3f}s ({legacy_nodes / max(elapsed, 1e-9):,.0f} nodes/s)')
+
+		if legacy_nodes != nodes:
+			print('\033[91mMove generators disagree!\033[0m')
+			raise SystemExit(1)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,183 @@
+# record.py
+
+# A compact binary format for finished games.
+# A record file starts with MAGIC, followed by one entry per game:
+# 	- a 3-byte header: the number of moves (little-endian uint16) and the
+# 		winner (uint8: rules.RED, rules.BLUE, or rules.EMPTY for a draw).
+# 	- 2 bytes per move (little-endian uint16): bits 0-5 hold the end square
+# 		and bits 6-11 the start square (rules.square numbering), bit 12 is set
+# 		when the move killed a piece and bit 13 when the player passed instead.
+# Every game starts from the starting board with RED to move, so the turn
+# 	number of each move is found by counting the moves before it. That board
+# 	is always the 8x8 one: files do not say what size a game was played on.
+# Files are only ever appended to, and are read one game at a time.
+
+from array import array
+from struct import Struct
+from sys import byteorder
+
+import rules
+
+MAGIC = b'MRGR\x01'
+HEADER = Struct('<HB')
+
+KILL = 1 << 12
+PASS = 1 << 13
+
+
+# Record files only hold 8x8 games, see the top of this file.
+def check_board():
+	if (rules.WIDTH, rules.HEIGHT) != (8, 8):
+		raise ValueError(f'Game records only hold games on the 8x8 board, not {rules.WIDTH}x{rules.HEIGHT}.')
+
+
+# Pack a move from start to end (board indexes) into a record code.
+def encode_move(start, end, killed=False):
+	return start << 6 | end | (KILL if killed else 0)
+
+
+# Unpack a record code into (start, end, killed), or None for a pass.
+def decode_move(code):
+	if code & PASS:
+		return None
+	return code >> 6 & 63, code & 63, bool(code & KILL)
+
+
+# Turn a GameState's history into an array of record codes.
+def encode_history(history):
+	return array('H', (PASS if move is None else encode_move(*move) for move in history))
+
+
+# Yield (turn, start, end, killed) for every move in a game's record codes,
+# 	where turn is the GameState.turn_count after the move. Passes are left out,
+# 	since they are not turns.
+def moves(codes):
+	turn = 0
+	for code in codes:
+		if code & PASS:
+			continue
+		turn += 1
+		yield turn, code >> 6 & 63, code & 63, bool(code & KILL)
+
+
+# Make the move or pass in one record code on a GameState.
+def apply(state, code):
+	if code & PASS:
+		state.pass_turn()
+	else:
+		state.move(rules.coords(code >> 6 & 63), rules.coords(code & 63))
+
+
+# Replay a game's record codes, yielding the GameState after every move or
+# 	pass. The same GameState object is updated and yielded each time.
+def replay(codes):
+	state = rules.GameState()
+	for code in codes:
+		apply(state, code)
+		yield state
+
+
+# How many moves apart the positions a Replay keeps are.
+SNAPSHOT_INTERVAL = 16
+
+
+# A recorded game that can be stepped through in both directions.
+# Every interval-th position is kept, so reaching any point costs a copy of the
+# 	nearest kept position at or before it plus fewer than interval moves,
+# 	rather than replaying the game from the start.
+class Replay():
+
+	def __init__(self, codes, interval=SNAPSHOT_INTERVAL):
+		self.codes = codes
+		self.interval = interval
+
+		state = rules.GameState()
+		self.snapshots = [state.copy()]
+		for index, code in enumerate(codes, 1):
+			apply(state, code)
+			if index % interval == 0:
+				self.snapshots.append(state.copy())
+
+		# index is how many codes have been applied to state.
+		self.index = 0
+		self.state = self.snapshots[0].copy()
+
+	def __len__(self):
+		return len(self.codes)
+
+	# Move to the position after the first index codes, where 0 is the
+	# 	starting board. index is clamped to the length of the game.
+	# Returns the GameState there, which is updated by later seeks.
+	def seek(self, index):
+		index = max(0, min(index, len(self.codes)))
+
+		# Carry on from the current position if that is no further than from
+		# 	the snapshot.
+		if not 0 <= index - self.index <= index % self.interval:
+			self.state = self.snapshots[index // self.interval].copy()
+			self.index = index // self.interval * self.interval
+
+		for code in self.codes[self.index:index]:
+			apply(self.state, code)
+		self.index = index
+		return self.state
+
+	def step(self, count=1):
+		return self.seek(self.index + count)
+
+
+# Appends games to a record file, creating it if needed.
+class GameWriter():
+
+	def __init__(self, path):
+		check_board()
+		self.file = open(path, 'ab')
+		if self.file.tell() == 0:
+			self.file.write(MAGIC)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	# Append one game. codes is a sequence of record codes and winner the
+	# 	winning color (rules.EMPTY if nobody won).
+	def write(self, codes, winner):
+		codes = array('H', codes)
+		if byteorder != 'little':
+			codes.byteswap()
+		self.file.write(HEADER.pack(len(codes), winner))
+		self.file.write(codes.tobytes())
+
+	def flush(self):
+		self.file.flush()
+
+	def close(self):
+		self.file.close()
+
+
+# Read the games in a record file one at a time.
+# Yields (winner, codes) for every game, with the record codes in an array.
+def read_games(path):
+	check_board()
+	with open(path, 'rb') as file:
+		if file.read(len(MAGIC)) != MAGIC:
+			raise ValueError(f'{path} is not a game record file')
+
+		while True:
+			header = file.read(HEADER.size)
+			if not header:
+				return
+			if len(header) < HEADER.size:
+				raise ValueError(f'{path} ends in the middle of a game')
+
+			count, winner = HEADER.unpack(header)
+			codes = array('H')
+			codes.frombytes(file.read(count * 2))
+			if len(codes) < count:
+				raise ValueError(f'{path} ends in the middle of a game')
+			if byteorder != 'little':
+				codes.byteswap()
+
+			yield winner, codes
@@ -0,0 +1,135 @@
+# rulebench.py
+
+# Times the square-by-square rule checks in rules.py, one call at a time,
+# 	against the versions they replaced: check_direction used to recurse one
+# 	square at a time, rebuilding the coordinates to check the bounds at each
+# 	step, and blocked walked its own pointers along the same rows and columns.
+# 	The old versions are kept here, so the two can be checked against each
+# 	other before their speed is compared.
+# Usage: python rulebench.py [POSITIONS] [--size WxH]
+
+from argparse import ArgumentParser
+from random import Random
+from time import perf_counter
+
+import rules
+from rules import square
+
+
+def legacy_blocked(p1, p2, board):
+	x_pointer, y_pointer = p1
+	if p2[1] < p1[1]:
+		while y_pointer - 1 > p2[1]:
+			y_pointer -= 1
+			if board[square(x_pointer, y_pointer)]:
+				return True
+	elif p2[1] > p1[1]:
+		while y_pointer + 1 < p2[1]:
+			y_pointer += 1
+			if board[square(x_pointer, y_pointer)]:
+				return True
+	elif p2[0] < p1[0]:
+		while x_pointer - 1 > p2[0]:
+			x_pointer -= 1
+			if board[square(x_pointer, y_pointer)]:
+				return True
+	else:
+		while x_pointer + 1 < p2[0]:
+			x_pointer += 1
+			if board[square(x_pointer, y_pointer)]:
+				return True
+	return False
+
+
+def legacy_can_kill(start, player_color, board):
+	kills = []
+	for x_dir, y_dir in ((0, -1), (0, 1), (-1, 0), (1, 0)):
+		kill = legacy_check_direction(start, player_color, board, x_dir, y_dir)
+		if kill is not None:
+			kills.append(kill)
+	return kills
+
+
+def legacy_check_direction(start, start_color, board, x_dir, y_dir):
+	x_coord = start[0] + x_dir
+	y_coord = start[1] + y_dir
+	if -1 in [x_coord, y_coord] or x_coord == rules.WIDTH or y_coord == rules.HEIGHT:
+		return
+
+	check_loc = square(x_coord, y_coord)
+	check_color = board[check_loc]
+	if check_color:
+		if check_color != start_color:
+			return check_loc
+		return
+	return legacy_check_direction((x_coord, y_coord), start_color, board, x_dir, y_dir)
+
+
+def legacy_not_engaging(proposed_location, player_color, board):
+	if not board[square(*proposed_location)]:
+		kills = legacy_can_kill(proposed_location, player_color, board)
+		if kills == []:
+			return True
+	return False
+
+
+# Time calls of function, one for each tuple of arguments in calls.
+# Returns the time per call in microseconds.
+def time_calls(function, calls):
+	start = perf_counter()
+	for args in calls:
+		function(*args)
+	return (perf_counter() - start) / len(calls) * 1e6
+
+
+# Compare the old and new checks on every square of random boards, for RED.
+# empty is the share of empty squares: a third is like the opening, while
+# 	pieces are far apart and the rays are long in the endgame.
+# blocked is given a random square in the same row or column.
+def benchmark(positions=1000, empty=1 / 3, seed=0):
+	rng = Random(seed)
+	locations = [rules.coords(index) for index in range(rules.CELLS)]
+
+	square_calls = []
+	direction_calls = []
+	line_calls = []
+	for _ in range(positions):
+		board = bytearray(
+			rules.EMPTY if rng.random() < empty else rng.choice((rules.RED, rules.BLUE))
+			for _ in range(rules.CELLS)
+		)
+		for x, y in locations:
+			square_calls.append(((x, y), rules.RED, board))
+			direction_calls.append(((x, y), rules.RED, board, *rng.choice(rules.DIRECTIONS)))
+			end = (x, rng.randrange(rules.HEIGHT)) if rng.random() < 0.5 else (rng.randrange(rules.WIDTH), y)
+			line_calls.append(((x, y), end, board))
+
+	functions = (
+		('can_kill', legacy_can_kill, rules.can_kill, square_calls),
+		('check_direction', legacy_check_direction, rules.check_direction, direction_calls),
+		('blocked', legacy_blocked, rules.blocked, line_calls),
+		('not_engaging', legacy_not_engaging, rules.not_engaging, square_calls),
+	)
+
+	# Both versions have to agree before their speed means anything.
+	for name, before, after, calls in functions:
+		for args in calls:
+			if before(*args) != after(*args):
+				raise AssertionError(f'{name} differs for {args[:2]}')
+
+	print(f'{positions} random {rules.WIDTH}x{rules.HEIGHT} boards, {empty:.0%} empty, every square')
+	for name, before, after, calls in functions:
+		before_time = time_calls(before, calls)
+		after_time = time_calls(after, calls)
+		print(f'  {name + ":":17}{before_time:6.2f} us before, {after_time:6.2f} us after, {before_time / after_time:.1f}x')
+
+
+if __name__ == '__main__':
+	parser = ArgumentParser(description='Time the rules.py checks against the ones they replaced.')
+	parser.add_argument('positions', type=int, nargs='?', default=1000)
+	parser.add_argument('--size', type=rules.parse_size, default=(rules.WIDTH, rules.HEIGHT), help='board size, WxH')
+	args = parser.parse_args()
+
+	rules.set_size(*args.size)
+	benchmark(args.positions)
+	benchmark(args.positions, empty=0.9)
@@ -0,0 +1,430 @@
+# rules.py
+
+# The Mad Rooks rules, without any dependency on graphics.py.
+# The board is a flat bytearray with one cell per square, indexed by
+# 	x * HEIGHT + y (the same numbering main.py uses for each Piece's name), and
+# 	every cell holds EMPTY, RED or BLUE. Locations are xy-coordinate tuples,
+# 	exactly like the ones valid_click returns.
+# The board is WIDTH squares across and HEIGHT squares down. set_size changes
+# 	that for every module at once: the ones that keep tables for the board
+# 	register with on_resize to rebuild them.
+
+WIDTH = 8
+HEIGHT = 8
+CELLS = WIDTH * HEIGHT
+
+# Moves are packed into 16 bits for the search (see movegen.encode_move), which
+# 	leaves 8 bits for each square.
+MAX_CELLS = 256
+
+EMPTY = 0
+RED = 1
+BLUE = 2
+
+# Games played out by the computer alone (selfplay.py, batch.py) are called a
+# 	draw once they run longer than this many turns.
+MAX_TURNS = 1000
+
+# Set DEBUG to have every GameState check the piece sets it keeps against a
+# 	scan of the whole board after every change.
+DEBUG = False
+
+_resize_hooks = []
+
+
+# Call hook now, and again every time the board size changes.
+def on_resize(hook):
+	_resize_hooks.append(hook)
+	hook()
+
+
+# Play on a board width squares across and height squares down (square if
+# 	height is left out). This should only be done between games.
+def set_size(width, height=None):
+	global WIDTH, HEIGHT, CELLS
+
+	height = width if height is None else height
+	if width < 1 or height < 1 or width * height > MAX_CELLS:
+		raise ValueError(f'Boards can have 1 to {MAX_CELLS} squares, not {width}x{height}.')
+
+	WIDTH = width
+	HEIGHT = height
+	CELLS = width * height
+	for hook in _resize_hooks:
+		hook()
+
+
+# Start a multiprocessing pool of workers playing on the current board size.
+# Workers are not always copies of this process (they are started fresh on
+# 	macOS and Windows) and would begin at 8x8, so each is told the size.
+def worker_pool(workers):
+	from multiprocessing import Pool
+	return Pool(workers, set_size, (WIDTH, HEIGHT))
+
+
+# Read a board size for the command line: 'WxH', or 'N' for a square board.
+# Returns a (width, height) tuple.
+def parse_size(text):
+	width, _, height = text.lower().partition('x')
+	return int(width), int(height or width)
+
+
+# Return the color of the other player.
+def opponent(color):
+	return BLUE if color == RED else RED
+
+
+# Convert xy-coordinates into a board index.
+def square(x, y):
+	return x * HEIGHT + y
+
+
+# Convert a board index back into xy-coordinates.
+def coords(index):
+	return divmod(index, HEIGHT)
+
+
+# Build the starting board, where colors alternate across the grid like a
+# 	checkerboard and the upper-left corner belongs to BLUE.
+def starting_board():
+	board = bytearray(CELLS)
+	for i in range(WIDTH):
+		for j in range(HEIGHT):
+			board[square(i, j)] = BLUE if (i + j) % 2 == 0 else RED
+	return board
+
+
+# Determine if p1 is orthogonal to p2.
+# p1 and p2 are both tuples with xy-coordinates.
+def orthogonal(p1, p2):
+	return (p1[0] == p2[0]) or (p1[1] == p2[1])
+
+
+# The four directions, in the order can_kill checks them, as (x, y) steps.
+# 	Moving along y changes the index by 1, moving along x by HEIGHT.
+# bitboard.py imports them, so its ray tables are in the same order.
+DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+UP, DOWN, LEFT, RIGHT = range(4)
+DIRECTION_NUMBERS = {step: number for number, step in enumerate(DIRECTIONS)}
+
+
+# Build RAYS[index][direction]: the board indexes from index (not included) to
+# 	the edge of the board in that direction, nearest first. Walking a ray
+# 	replaces stepping the coordinates and checking the bounds on every square.
+# The checks below look squares up in the tables with x * HEIGHT + y written
+# 	out, which is the same as square but saves a call on every check.
+def _build_rays():
+	rays = []
+	for index in range(CELLS):
+		start_x, start_y = coords(index)
+		directions = []
+		for x_dir, y_dir in DIRECTIONS:
+			ray = []
+			x = start_x + x_dir
+			y = start_y + y_dir
+			while 0 <= x < WIDTH and 0 <= y < HEIGHT:
+				ray.append(square(x, y))
+				x += x_dir
+				y += y_dir
+			directions.append(tuple(ray))
+		rays.append(tuple(directions))
+	return tuple(rays)
+
+
+# Build BETWEEN[start][end]: the board indexes blocked has to check to move
+# 	from start to end, nearest first.
+def _build_between():
+	between = []
+	for start in range(CELLS):
+		x, y = coords(start)
+		rays = RAYS[start]
+		ends = []
+		for end in range(CELLS):
+			x_distance, y_distance = coords(end)
+			x_distance -= x
+			y_distance -= y
+
+			# Moving along the column comes first, like it always has.
+			if y_distance:
+				ends.append(rays[UP if y_distance < 0 else DOWN][:abs(y_distance) - 1])
+			elif x_distance:
+				ends.append(rays[LEFT if x_distance < 0 else RIGHT][:abs(x_distance) - 1])
+			else:
+				ends.append(())
+		between.append(tuple(ends))
+	return tuple(between)
+
+
+def _resize():
+	global RAYS, BETWEEN
+	RAYS = _build_rays()
+	BETWEEN = _build_between()
+
+on_resize(_resize)
+
+
+# Determine if there are any pieces in the way between p1 and p2.
+# Only the squares strictly between the two locations are checked, so the
+# 	destination itself may hold a piece to kill.
+def blocked(p1, p2, board):
+
+	for index in BETWEEN[p1[0] * HEIGHT + p1[1]][p2[0] * HEIGHT + p2[1]]:
+		if board[index]:
+			return True
+	return False
+
+
+# Find if the provided piece has anybody it can kill.
+# start is a tuple with the xy-coordinates of the piece to check.
+# player_color is the color of the player's piece.
+# board is the flat board of all game pieces.
+# Returns a list of the board indexes of every piece that can be killed.
+def can_kill(start, player_color, board):
+
+	kills = []
+
+	# The first piece along each ray is the only one that could be killed.
+	for ray in RAYS[start[0] * HEIGHT + start[1]]:
+		for index in ray:
+			color = board[index]
+			if color:
+				if color != player_color:
+					kills.append(index)
+				break
+
+	return kills
+
+
+# Determine if a piece has anybody it can kill in one direction.
+# start is the xy-coordinates of the piece.
+# start_color is the color of the piece.
+# x_dir and y_dir are two independent numbers in the range [-1, 1], and indicate
+# 	which direction to look in.
+# Returns the board index of the piece that can be killed, or None.
+def check_direction(start, start_color, board, x_dir, y_dir):
+
+	for index in RAYS[start[0] * HEIGHT + start[1]][DIRECTION_NUMBERS[x_dir, y_dir]]:
+		color = board[index]
+
+		# The first piece in the way can be killed if it is the opponent's.
+		if color:
+			if color != start_color:
+				return index
+			return
+
+
+# Determine whether a piece if moved to the proposed location would be engaging
+# 	an enemy's piece for killing.
+# proposed_location is a tuple with xy-coordinates of where a piece wants to
+# 	move to.
+# player_color is the color of the piece that will be moved.
+def not_engaging(proposed_location, player_color, board):
+
+	# First determine if the proposed space is empty.
+	# Then, if the piece can kill an opposing piece, via the transitive property
+	# 	that opposing piece will be able to kill the player's piece and thus is
+	# 	engaging it. The first such piece settles it.
+	index = proposed_location[0] * HEIGHT + proposed_location[1]
+	if board[index]:
+		return False
+
+	for ray in RAYS[index]:
+		for seen in ray:
+			color = board[seen]
+			if color:
+				if color != player_color:
+					return False
+				break
+	return True
+
+
+# Check a move from start to end for the player, in the same order main.py
+# 	has always used.
+# Returns None if the move is legal, otherwise the message explaining why it
+# 	is not.
+def validate_move(start, end, player_color, board):
+
+	end_color = board[square(*end)]
+
+	# Check if the movement is orthogonal.
+	if not orthogonal(start, end):
+		return "Pieces can only move orthogonally."
+
+	# Check if the player is trying to take their own piece.
+	if end_color == player_color:
+		return "You cannot kill your own pieces."
+
+	# Check if there are pieces in the way of the movement.
+	if blocked(start, end, board):
+		return "There are other pieces in the way."
+
+	# Check if there are killable pieces, and if the movement is to one of
+	# 	those pieces.
+	killable_pieces = can_kill(start, player_color, board)
+	if killable_pieces != [] and square(*end) not in killable_pieces:
+		return "That piece can kill another."
+
+	# Check if the player is engaging an enemy piece.
+	if not_engaging(end, player_color, board):
+		return "Pieces must engage or kill another."
+
+
+# Count how many pieces each player has left.
+# Returns a tuple of (red, blue).
+def count_pieces(board):
+	return board.count(RED), board.count(BLUE)
+
+
+# Determine if there is a winner.
+# Returns the color of the winning player, or None if both players still have
+# 	pieces on the board.
+def winner(board):
+	red, blue = count_pieces(board)
+
+	if red > 0 and blue > 0:
+		return None
+	return RED if red > 0 else BLUE
+
+
+# The complete state of a game: the board, whose turn it is, how many turns
+# 	have been taken and the moves that led there.
+class GameState():
+
+	def __init__(self, board=None, red_turn=True, turn_count=0):
+		self.board = starting_board() if board is None else bytearray(board)
+
+		# red_turn is True when it is RED's turn and False for BLUE's.
+		self.red_turn = red_turn
+		self.turn_count = turn_count
+
+		# history holds (start, end, killed) for every move, with board
+		# 	indexes, and None for every pass. That is all it takes to undo
+		# 	one: the end square held an enemy piece if killed, otherwise
+		# 	nothing.
+		self.history = []
+
+		# undone holds the history entries taken back by undo, most recent
+		# 	last, for redo. Any new move or pass clears it.
+		self.undone = []
+
+		# piece_squares holds the set of board indexes of each player's
+		# 	pieces, by color. Moves keep it up to date, so counting the pieces
+		# 	or finding the winner never has to look at the board.
+		self.piece_squares = {RED: set(), BLUE: set()}
+		for index, color in enumerate(self.board):
+			if color:
+				self.piece_squares[color].add(index)
+
+	def copy(self):
+		state = GameState(self.board, self.red_turn, self.turn_count)
+		state.history = list(self.history)
+		state.undone = list(self.undone)
+		return state
+
+	# Count how many pieces each player has left.
+	# Returns a tuple of (red, blue).
+	def count_pieces(self):
+		return len(self.piece_squares[RED]), len(self.piece_squares[BLUE])
+
+	# Compare piece_squares with a scan of the board, for DEBUG.
+	def check_pieces(self):
+		for color, name in ((RED, 'RED'), (BLUE, 'BLUE')):
+			found = {index for index, cell in enumerate(self.board) if cell == color}
+			if found != self.piece_squares[color]:
+				raise AssertionError(f"{name}'s pieces are out of step with the board at {sorted(self.piece_squares[color] ^ found)}")
+
+	# The color of the player whose turn it is.
+	def player_color(self):
+		return RED if self.red_turn else BLUE
+
+	# The color at the xy-coordinates loc, or EMPTY.
+	def color_at(self, loc):
+		return self.board[square(*loc)]
+
+	# Check a move for the player whose turn it is.
+	def validate(self, start, end):
+		return validate_move(start, end, self.player_color(), self.board)
+
+	# Perform a move that has already been validated and pass the turn.
+	# Returns True if the move killed a piece.
+	def move(self, start, end):
+		self.undone.clear()
+		return self._move(square(*start), square(*end))
+
+	def _move(self, start_index, end_index):
+		board = self.board
+		color = board[start_index]
+		killed = board[end_index] != EMPTY
+		board[end_index] = color
+		board[start_index] = EMPTY
+
+		own = self.piece_squares[color]
+		own.remove(start_index)
+		own.add(end_index)
+		if killed:
+			self.piece_squares[opponent(color)].remove(end_index)
+
+		self.turn_count += 1
+		self.red_turn = not self.red_turn
+		self.history.append((start_index, end_index, killed))
+		if DEBUG:
+			self.check_pieces()
+		return killed
+
+	# Give the turn to the other player without moving, for when the player
+	# 	whose turn it is has no legal moves.
+	def pass_turn(self):
+		self.undone.clear()
+		self.red_turn = not self.red_turn
+		self.history.append(None)
+
+	# Take back the last move or pass, leaving undone alone. Together with
+	# 	move, this lets a search walk the game tree on one GameState
+	# 	instead of copying it for every node.
+	# Returns the history entry that was taken back.
+	def unmake(self):
+		entry = self.history.pop()
+		self.red_turn = not self.red_turn
+		if entry is not None:
+			start_index, end_index, killed = entry
+			board = self.board
+			color = board[end_index]
+			board[start_index] = color
+			board[end_index] = opponent(color) if killed else EMPTY
+
+			own = self.piece_squares[color]
+			own.remove(end_index)
+			own.add(start_index)
+			if killed:
+				self.piece_squares[opponent(color)].add(end_index)
+
+			self.turn_count -= 1
+			if DEBUG:
+				self.check_pieces()
+		return entry
+
+	# Take back the last move or pass, keeping it for redo.
+	# Returns the history entry that was taken back.
+	def undo(self):
+		entry = self.unmake()
+		self.undone.append(entry)
+		return entry
+
+	# Make the last move or pass that was undone again.
+	# Returns its history entry.
+	def redo(self):
+		entry = self.undone.pop()
+		if entry is None:
+			self.red_turn = not self.red_turn
+			self.history.append(None)
+		else:
+			self._move(entry[0], entry[1])
+		return entry
+
+	# Determine if there is a winner, like the winner function but from the
+	# 	piece counts.
+	def winner(self):
+		red, blue = self.count_pieces()
+		if red > 0 and blue > 0:
+			return None
+		return RED if red > 0 else BLUE
@@ -0,0 +1,301 @@
+# selfplay.py
+
+# Plays many games between two computer policies, spread over every core,
+# 	without a display.
+# Usage: python selfplay.py GAMES --first POLICY --second POLICY [--seed N]
+# A policy is 'random', 'greedy' (kills when it can, otherwise random) or
+# 	'search:DEPTH' (the ai.py search, cut off at DEPTH moves).
+# The two policies swap colors every game, and every game has its own seed
+# 	derived from --seed, so a run can be repeated exactly.
+# Random against random is played in batches by batch.py when NumPy 2.0 or
+# 	later is installed and the board fits in its 64-bit bitboards. Games in
+# 	a batch share one generator, so --results leaves their seed empty, and
+# 	giving --opening plays them one at a time instead.
+# --size plays on another board, but only 8x8 games can be recorded.
+
+from argparse import ArgumentParser
+from collections import Counter
+from os import cpu_count
+from array import array
+from random import Random
+from time import perf_counter
+import json
+
+import rules
+import record
+import gamedb
+from movegen import generate, move_array, decode_move
+from bitboard import from_board
+from ai import Searcher, make_move
+
+try:
+	import batch
+except ImportError:
+	batch = None
+
+# How many games each batch.py job plays at once.
+BATCH_GAMES = 4096
+
+
+# Plays a uniformly random legal move.
+class RandomPolicy():
+
+	# Returns a (start, end) pair of board indexes, or None if the player has
+	# 	no legal moves.
+	def choose(self, own, enemy, color, rng):
+		moves = move_array(own, enemy)
+		if not moves:
+			return None
+		return decode_move(moves[rng.randrange(len(moves))])
+
+
+# Kills a piece whenever it can, otherwise plays a random legal move.
+class GreedyPolicy():
+
+	def choose(self, own, enemy, color, rng):
+		kills = []
+		quiet = []
+		for move in generate(own, enemy):
+			if enemy >> move[1] & 1:
+				kills.append(move)
+			else:
+				quiet.append(move)
+		moves = kills or quiet
+		if not moves:
+			return None
+		return moves[rng.randrange(len(moves))]
+
+
+# Plays the move the ai.py search likes best at a fixed depth.
+class SearchPolicy():
+
+	def __init__(self, depth):
+		self.searcher = Searcher(time_limit=float('inf'), max_depth=depth, table_mb=1)
+
+	def choose(self, own, enemy, color, rng):
+		return self.searcher.search(own, enemy, color)
+
+
+# Policies are kept per process so each search table is only allocated once.
+_policies = {}
+
+
+# Build (or reuse) the policy described by spec.
+def make_policy(spec):
+	if spec not in _policies:
+		name, _, depth = spec.partition(':')
+		if name == 'random':
+			_policies[spec] = RandomPolicy()
+		elif name == 'greedy':
+			_policies[spec] = GreedyPolicy()
+		elif name == 'search':
+			_policies[spec] = SearchPolicy(int(depth or 2))
+		else:
+			raise ValueError(f'Unknown policy: {spec}')
+	return _policies[spec]
+
+
+# Play one game from the starting board.
+# opening is how many turns are played at random before the policies take
+# 	over, so that deterministic policies do not repeat the same game.
+# Returns (winner, turn_count, codes), where winner is rules.RED, rules.BLUE or
+# 	rules.EMPTY for a draw, turn_count is the number of moves made and codes
+# 	is the game's record.py codes.
+def play_game(red_spec, blue_spec, seed, opening=0, max_turns=rules.MAX_TURNS):
+	rng = Random(seed)
+	policies = {rules.RED: make_policy(red_spec), rules.BLUE: make_policy(blue_spec)}
+	opening_policy = RandomPolicy()
+
+	red, blue = from_board(rules.starting_board())
+	color = rules.RED
+	turn_count = 0
+	passed = False
+	codes = array('H')
+
+	while red and blue and turn_count < max_turns:
+		own, enemy = (red, blue) if color == rules.RED else (blue, red)
+		policy = opening_policy if turn_count < opening else policies[color]
+
+		move = policy.choose(own, enemy, color, rng)
+		if move is None:
+
+			# Neither player can move.
+			if passed:
+				break
+			passed = True
+			codes.append(record.PASS)
+
+		else:
+			passed = False
+			codes.append(record.encode_move(*move, enemy >> move[1] & 1))
+			own, enemy = make_move(own, enemy, move)
+			red, blue = (enemy, own) if color == rules.RED else (own, enemy)
+			turn_count += 1
+
+		color = rules.opponent(color)
+
+	if red and blue:
+		return rules.EMPTY, turn_count, codes
+	return (rules.RED if red else rules.BLUE), turn_count, codes
+
+
+# Play one game from make_jobs, in a worker process.
+# Returns a list holding the job along with the result, since results arrive
+# 	out of order. The record codes are only sent back if the job asks for them.
+def play_job(job):
+	index, red_spec, blue_spec, seed, opening, keep_record = job
+	won, turn_count, codes = play_game(red_spec, blue_spec, seed, opening)
+	return [(job, (won, turn_count, codes if keep_record else None))]
+
+
+# Play a run of random games with batch.py in a worker process.
+# job is (first index, number of games, seed, keep_record).
+# Returns a list of (job, result) pairs like play_job, one per game. The games
+# 	share one generator, so no game has a seed of its own to replay it from,
+# 	and each job's seed is None.
+def _play_batch(job):
+	first_index, games, seed, keep_record = job
+	winners, turn_counts, records = batch.play_random_games(games, seed, rules.MAX_TURNS, keep_record)
+	return [
+		(
+			(first_index + offset, 'random', 'random', None, 0, keep_record),
+			(int(winners[offset]), int(turn_counts[offset]), records[offset] if keep_record else None)
+		)
+		for offset in range(games)
+	]
+
+
+# Lay out the games: the policies alternate colors, and each game's seed is
+# 	taken from a generator seeded with seed.
+def make_jobs(games, first, second, seed, opening, keep_record=False):
+	rng = Random(seed)
+	jobs = []
+	for index in range(games):
+		red_spec, blue_spec = (first, second) if index % 2 == 0 else (second, first)
+		jobs.append((index, red_spec, blue_spec, rng.getrandbits(32), opening, keep_record))
+	return jobs
+
+
+# Summarise finished games.
+# results is a list of (job, (winner, turn_count, codes)) pairs.
+def summarise(results, first, second):
+	wins = Counter()
+	color_wins = Counter()
+	lengths = []
+	decided_lengths = []
+
+	for (index, *_), (won, turn_count, _) in results:
+		lengths.append(turn_count)
+		if won == rules.EMPTY:
+			wins['draw'] += 1
+			continue
+
+		decided_lengths.append(turn_count)
+		color_wins['red' if won == rules.RED else 'blue'] += 1
+
+		# The first policy plays RED in the even games, see make_jobs.
+		first_won = (won == rules.RED) == (index % 2 == 0)
+		wins['first' if first_won else 'second'] += 1
+
+	games = len(results)
+	histogram = Counter(length // 10 * 10 for length in lengths)
+	return {
+		'games': games,
+		'first': first,
+		'second': second,
+		'first_win_rate': wins['first'] / games if games else 0.0,
+		'second_win_rate': wins['second'] / games if games else 0.0,
+		'draw_rate': wins['draw'] / games if games else 0.0,
+		'red_win_rate': color_wins['red'] / games if games else 0.0,
+		'blue_win_rate': color_wins['blue'] / games if games else 0.0,
+		'average_winning_turn': sum(decided_lengths) / len(decided_lengths) if decided_lengths else None,
+		'length_histogram': {f'{start}-{start + 9}': histogram[start] for start in sorted(histogram)},
+	}
+
+
+def main():
+	parser = ArgumentParser(description='Play Mad Rooks games between two computer policies.')
+	parser.add_argument('games', type=int)
+	parser.add_argument('--first', default='greedy', help="policy: random, greedy or search:DEPTH")
+	parser.add_argument('--second', default='random', help="policy: random, greedy or search:DEPTH")
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--opening', type=int, help='random turns at the start of each game (default: 4)')
+	parser.add_argument('--workers', type=int, default=cpu_count() or 1)
+	parser.add_argument('--results', help='append one CSV line per game to this file')
+	parser.add_argument('--summary', help='write the summary as JSON to this file')
+	parser.add_argument('--record', help='append every game to this game record file')
+	parser.add_argument('--database', help='add every game to this game database directory')
+	parser.add_argument('--size', type=rules.parse_size, default=(rules.WIDTH, rules.HEIGHT), help='board size, WxH')
+	args = parser.parse_args()
+
+	if args.size != (8, 8) and (args.record or args.database):
+		parser.error('only 8x8 games can be recorded')
+	rules.set_size(*args.size)
+
+	# Fail before starting any workers if a policy is misspelled.
+	make_policy(args.first)
+	make_policy(args.second)
+
+	# batch.py plays whole games at random, so it is only used when no opening
+	# 	was asked for.
+	keep_records = bool(args.record or args.database)
+	use_batch = (
+		args.first == args.second == 'random' and args.opening is None
+		and batch is not None and rules.CELLS <= batch.MAX_CELLS
+	)
+	opening = 4 if args.opening is None else args.opening
+	if use_batch:
+		rng = Random(args.seed)
+		jobs = [
+			(first_index, min(BATCH_GAMES, args.games - first_index), rng.getrandbits(32), keep_records)
+			for first_index in range(0, args.games, BATCH_GAMES)
+		]
+		worker = _play_batch
+		chunksize = 1
+	else:
+		jobs = make_jobs(args.games, args.first, args.second, args.seed, opening, keep_records)
+		worker = play_job
+		chunksize = max(1, len(jobs) // (args.workers * 16))
+
+	results = []
+	results_file = open(args.results, 'a') if args.results else None
+	writer = record.GameWriter(args.record) if args.record else None
+	database = gamedb.GameDatabase(args.database) if args.database else None
+
+	start = perf_counter()
+	with rules.worker_pool(args.workers) as pool:
+		for finished in pool.imap_unordered(worker, jobs, chunksize=chunksize):
+			for result in finished:
+				results.append(result)
+
+				(index, red_spec, blue_spec, seed, *_), (won, turn_count, codes) = result
+				if results_file:
+					results_file.write(f'{index},{"" if seed is None else seed},{red_spec},{blue_spec},{won},{turn_count}\n')
+				if writer:
+					writer.write(codes, won)
+				if database is not None:
+					database.add_game(codes, won)
+
+				if len(results) % 100 == 0 or len(results) == args.games:
+					elapsed = perf_counter() - start
+					print(f'\r{len(results)}/{args.games} games, {len(results) / elapsed * 60:,.0f} games/min', end='', flush=True)
+	print()
+
+	if results_file:
+		results_file.close()
+	if writer:
+		writer.close()
+	if database is not None:
+		database.update_indexes()
+		database.close()
+
+	summary = summarise(results, args.first, args.second)
+	print(json.dumps(summary, indent=2))
+
+	if args.summary:
+		with open(args.summary, 'w') as summary_file:
+			json.dump(summary, summary_file, indent=2)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,481 @@
+# tablebase.py
+
+# Endgame tablebases for Mad Rooks, built by retrograde analysis.
+# A table holds the exact result of every position with a given number of red
+# 	and blue pieces, for either player to move, as one little-endian int16:
+# 	- d > 0: the player to move wins, and the opponent's last piece is taken
+# 		d moves (plies) from now with best play.
+# 	- d < 0: the player to move loses in -d moves.
+# 	- 0: a draw, either because nobody can force a win or because neither
+# 		player can move.
+# Positions are perfectly indexed, so a table has no gaps and a probe is one
+# 	read from a memory-mapped file: see position_index. Tables are only built
+# 	for at least as many red pieces as blue ones, since swapping the colors
+# 	(and who is to move) gives the same result.
+# Building a table needs the tables it can capture down into, so they are built
+# 	in order of the total number of pieces. For each table:
+# 	1. Every position's moves are generated. A capture lands in a smaller,
+# 		finished table, so its result is known; every other move (or a pass)
+# 		stays in the table and is counted as unresolved.
+# 	2. Starting from the positions decided by captures, results spread
+# 		backwards one distance at a time: a position whose opponent loses
+# 		after one of its moves wins one move later, and a position whose
+# 		moves all lose once every one of them has been decided. The moves
+# 		into a position are found by sliding each of the last mover's pieces
+# 		back and checking the move with movegen.
+# 	3. Whatever is still undecided is a draw.
+# The move generation in both steps is spread over a process pool.
+# Tables can be built for any board size. On a small enough board, building up
+# 	to half the squares a side solves the whole game from the starting board.
+# Usage: python tablebase.py DIRECTORY [--pieces K] [--workers N] [--size WxH]
+# 	[--check]
+# 	builds every table with up to K pieces a side. --check then solves them
+# 	again the slow way (see check), which is only practical on small boards.
+
+from array import array
+from math import comb
+from mmap import mmap, ACCESS_READ
+from multiprocessing import Pool
+from os import cpu_count
+from pathlib import Path
+from struct import Struct
+from sys import byteorder
+from time import perf_counter
+
+import rules
+from bitboard import squares, reach, hits, from_board
+from movegen import generate, legal_destinations
+
+VALUE = Struct('<h')
+
+# How many red piece placements each worker job covers.
+CHUNK = 64
+
+
+# The number of positions in the table for red and blue pieces.
+def table_size(red_count, blue_count):
+	return comb(rules.CELLS, red_count) * comb(rules.CELLS - red_count, blue_count) * 2
+
+
+# The file a table is kept in. Tables for boards other than 8x8 say which.
+def table_name(red_count, blue_count):
+	if (rules.WIDTH, rules.HEIGHT) == (8, 8):
+		return f'{red_count}v{blue_count}.tb'
+	return f'{rules.WIDTH}x{rules.HEIGHT}-{red_count}v{blue_count}.tb'
+
+
+# Rank a set of squares, given in increasing order, among all sets of the same
+# 	size (the combinatorial number system).
+def _rank(indexes):
+	return sum(comb(index, place) for place, index in enumerate(indexes, 1))
+
+
+# The set of count squares with the given rank, in increasing order.
+def _unrank(rank, count):
+	indexes = []
+	for place in range(count, 0, -1):
+		index = place - 1
+		while comb(index + 1, place) <= rank:
+			index += 1
+		rank -= comb(index, place)
+		indexes.append(index)
+	return indexes[::-1]
+
+
+# The index of a position in its table. The red pieces are ranked among all
+# 	squares, the blue ones among the squares red leaves free, and the lowest
+# 	bit is 1 when BLUE is to move.
+def position_index(red, blue, red_turn):
+	blue_rank = 0
+	for place, index in enumerate(squares(blue), 1):
+		blue_rank += comb(index - (red & ((1 << index) - 1)).bit_count(), place)
+	red_count = red.bit_count()
+	red_rank = _rank(squares(red))
+	return (red_rank * comb(rules.CELLS - red_count, blue.bit_count()) + blue_rank) << 1 | (not red_turn)
+
+
+# The (red, blue, red_turn) position at an index of the red_count v
+# 	blue_count table.
+def index_position(index, red_count, blue_count):
+	red_rank, blue_rank = divmod(index >> 1, comb(rules.CELLS - red_count, blue_count))
+	red_squares = _unrank(red_rank, red_count)
+	free = [square for square in range(rules.CELLS) if square not in red_squares]
+	red = sum(1 << square for square in red_squares)
+	blue = sum(1 << free[rank] for rank in _unrank(blue_rank, blue_count))
+	return red, blue, not index & 1
+
+
+# Reads finished tables, opening each file the first time it is needed.
+class Tablebase():
+
+	def __init__(self, directory):
+		self.directory = Path(directory)
+		self.tables = {}
+
+	# The mapped table for a material balance, or None if it has not been
+	# 	built.
+	def _table(self, red_count, blue_count):
+		table = self.tables.get((red_count, blue_count))
+		if table is None:
+			path = self.directory / table_name(red_count, blue_count)
+			if not path.exists():
+				return None
+			with open(path, 'rb') as file:
+				table = mmap(file.fileno(), 0, access=ACCESS_READ)
+			self.tables[red_count, blue_count] = table
+		return table
+
+	# Look up a position given as bitboards.
+	# Returns its value for the player to move (see the top of this file),
+	# 	or None if there is no table for it or the game is already over.
+	def probe(self, red, blue, red_turn):
+		red_count = red.bit_count()
+		blue_count = blue.bit_count()
+		if not red_count or not blue_count:
+			return None
+		if red_count < blue_count:
+			red, blue, red_turn = blue, red, not red_turn
+			red_count, blue_count = blue_count, red_count
+
+		table = self._table(red_count, blue_count)
+		if table is None:
+			return None
+		return VALUE.unpack_from(table, position_index(red, blue, red_turn) * 2)[0]
+
+	# Look up a rules.GameState.
+	def probe_state(self, state):
+		red = sum(1 << index for index, color in enumerate(state.board) if color == rules.RED)
+		blue = sum(1 << index for index, color in enumerate(state.board) if color == rules.BLUE)
+		return self.probe(red, blue, state.red_turn)
+
+	def close(self):
+		for table in self.tables.values():
+			table.close()
+		self.tables = {}
+
+
+# The tables of the worker processes, for looking up captures.
+_tablebase = None
+
+
+def _start_worker(directory, size):
+	global _tablebase
+	rules.set_size(*size)
+	_tablebase = Tablebase(directory)
+
+
+# Step 1 for the positions with red placements first_rank to last_rank - 1.
+# Returns (tentative, unresolved, longest) arrays for that slice of the table:
+# 	- tentative is the result the captures alone decide (0 if none): a win
+# 		if any capture leaves the opponent lost, or a loss if every move is a
+# 		capture that leaves the opponent winning.
+# 	- unresolved counts the moves that are not known to leave the opponent
+# 		winning, and is 0 for positions that already win.
+# 	- longest is the longest of the losses known so far, plus one.
+def _scan(job):
+	red_count, blue_count, first_rank, last_rank = job
+	cells = rules.CELLS
+	blue_size = comb(cells - red_count, blue_count)
+	size = (last_rank - first_rank) * blue_size * 2
+	tentative = array('h', bytes(size * 2))
+	unresolved = array('B', bytes(size))
+	longest = array('h', bytes(size * 2))
+	probe = _tablebase.probe
+	offset = first_rank * blue_size * 2
+
+	for red_rank in range(first_rank, last_rank):
+		red_squares = _unrank(red_rank, red_count)
+		red = sum(1 << square for square in red_squares)
+		free = [square for square in range(cells) if square not in red_squares]
+
+		for blue_rank in range(blue_size):
+			blue = sum(1 << free[rank] for rank in _unrank(blue_rank, blue_count))
+
+			for red_turn in (True, False):
+				own, enemy = (red, blue) if red_turn else (blue, red)
+				win = 0
+				loss = 0
+				count = 0
+				moved = False
+
+				for start, end in generate(own, enemy):
+					moved = True
+					end_bit = 1 << end
+					if not enemy & end_bit:
+						count += 1
+						continue
+
+					# Taking the last piece wins on the spot.
+					left = enemy ^ end_bit
+					if not left:
+						win = 1
+						break
+
+					moved_own = own ^ (1 << start) | end_bit
+					value = probe(*((moved_own, left) if red_turn else (left, moved_own)), not red_turn)
+					if value < 0:
+						win = min(win, 1 - value) if win else 1 - value
+					elif value > 0:
+						loss = max(loss, value + 1)
+					else:
+						count += 1
+
+				# A player who cannot move passes, which stays in the table.
+				if not moved:
+					count = 1
+
+				index = ((red_rank * blue_size + blue_rank) << 1 | (not red_turn)) - offset
+				unresolved[index] = count
+				longest[index] = loss
+				if win:
+					tentative[index] = win
+
+					# A win is never a loss, however its other moves turn out.
+					unresolved[index] = 0
+				elif not count:
+					tentative[index] = -loss
+
+	return tentative, unresolved, longest
+
+
+# The positions in the table that have a move (or pass) into each of the
+# 	positions in job, which is (red_count, blue_count, indexes).
+# Returns a list with a list of indexes for every position.
+def _predecessors(job):
+	red_count, blue_count, indexes = job
+	found = []
+	for index in indexes:
+		red, blue, red_turn = index_position(index, red_count, blue_count)
+
+		# The player who just moved, and who is to move in the predecessors.
+		mover_red = not red_turn
+		mover, other = (red, blue) if mover_red else (blue, red)
+		occupied = red | blue
+
+		before = []
+		for end in squares(mover):
+
+			# A move that takes nothing has to end engaging an enemy piece,
+			# 	which moving back can only hide, never reveal.
+			if not hits(end, occupied) & other:
+				continue
+
+			for start in squares(reach(end, occupied)):
+				earlier = mover ^ (1 << end) | (1 << start)
+				if legal_destinations(start, earlier, other) >> end & 1:
+					position = (earlier, other) if mover_red else (other, earlier)
+					before.append(position_index(*position, mover_red))
+
+		# The same board with the mover to move, if they had to pass.
+		if not any(True for _ in generate(mover, other)):
+			before.append(position_index(red, blue, mover_red))
+
+		found.append(before)
+	return found
+
+
+# Build the red_count v blue_count table in directory. Every table it can
+# 	capture down into has to be built already.
+def build_table(directory, red_count, blue_count, pool, workers):
+	size = table_size(red_count, blue_count)
+	red_size = comb(rules.CELLS, red_count)
+
+	# Step 1.
+	tentative = array('h')
+	unresolved = array('B')
+	longest = array('h')
+	jobs = [
+		(red_count, blue_count, first, min(first + CHUNK, red_size))
+		for first in range(0, red_size, CHUNK)
+	]
+	for part in pool.imap(_scan, jobs):
+		tentative.extend(part[0])
+		unresolved.extend(part[1])
+		longest.extend(part[2])
+
+	# Step 2. pending holds the positions waiting to be decided at each
+	# 	distance, as the index for wins and ~index for losses.
+	values = array('h', bytes(size * 2))
+	pending = {}
+	for index, value in enumerate(tentative):
+		if value:
+			pending.setdefault(abs(value), []).append(index if value > 0 else ~index)
+	del tentative
+
+	while pending:
+		distance = min(pending)
+		decided = []
+		for entry in pending.pop(distance):
+			index = entry if entry >= 0 else ~entry
+			if not values[index]:
+				values[index] = distance if entry >= 0 else -distance
+				decided.append(index)
+
+		step = max(1, len(decided) // (workers * 8))
+		jobs = [(red_count, blue_count, decided[first:first + step]) for first in range(0, len(decided), step)]
+		for part, found in zip(jobs, pool.imap(_predecessors, jobs)):
+			for index, before in zip(part[2], found):
+				value = values[index]
+				for earlier in before:
+					if values[earlier]:
+						continue
+
+					# A move into a lost position wins.
+					if value < 0:
+						pending.setdefault(distance + 1, []).append(earlier)
+
+					# A position loses once all of its moves lead to wins.
+					elif unresolved[earlier]:
+						if longest[earlier] < distance + 1:
+							longest[earlier] = distance + 1
+						unresolved[earlier] -= 1
+						if not unresolved[earlier]:
+							pending.setdefault(longest[earlier], []).append(~earlier)
+
+	# Step 3 needs nothing: undecided positions are already 0.
+	if byteorder != 'little':
+		values.byteswap()
+	path = Path(directory) / table_name(red_count, blue_count)
+	temporary = path.with_suffix('.tmp')
+	with open(temporary, 'wb') as file:
+		values.tofile(file)
+	temporary.replace(path)
+	return values
+
+
+# Build every table with up to pieces pieces a side that is not built yet.
+def build(directory, pieces, workers=None):
+	directory = Path(directory)
+	directory.mkdir(parents=True, exist_ok=True)
+	workers = workers or cpu_count() or 1
+
+	materials = sorted(
+		(
+			(red_count, blue_count)
+			for red_count in range(1, pieces + 1) for blue_count in range(1, red_count + 1)
+			if red_count + blue_count <= rules.CELLS
+		),
+		key=sum
+	)
+	for red_count, blue_count in materials:
+		if (directory / table_name(red_count, blue_count)).exists():
+			continue
+
+		start = perf_counter()
+		# A new pool for each table, so the workers see the tables built so far.
+		with Pool(workers, _start_worker, (str(directory), (rules.WIDTH, rules.HEIGHT))) as pool:
+			values = build_table(directory, red_count, blue_count, pool, workers)
+
+		wins = sum(1 for value in values if value > 0)
+		losses = sum(1 for value in values if value < 0)
+		longest = max(map(abs, values), default=0)
+		print(
+			f'{red_count}v{blue_count}: {len(values):,} positions, {wins:,} wins, {losses:,} losses, '
+			f'{len(values) - wins - losses:,} draws, longest {longest} moves, {perf_counter() - start:.1f}s'
+		)
+
+	# Say how the game goes if the tables reach back to the starting board.
+	value = Tablebase(directory).probe(*from_board(rules.starting_board()), True)
+	if value is not None:
+		result = 'a draw' if not value else f'RED {"wins" if value > 0 else "loses"} in {abs(value)} moves'
+		print(f'From the starting board, {result}.')
+
+
+# Solve every position with up to pieces pieces a side again, independently
+# 	of the generator: the moves come from perft.legacy_moves, which only asks
+# 	rules.validate_move, and results are worked out forwards, one distance at
+# 	a time, from each position's moves. Every table built in directory is then
+# 	compared with the result, position by position.
+# Returns the number of positions that differ.
+def check(directory, pieces):
+	from perft import legacy_moves
+
+	# The positions after every move (or pass) of every position, as
+	# 	(red, blue, red_turn), with None for a move that takes the last piece.
+	start = perf_counter()
+	moves = {}
+	for red_count in range(1, pieces + 1):
+		for blue_count in range(1, pieces + 1):
+			if red_count + blue_count > rules.CELLS:
+				continue
+			for index in range(table_size(red_count, blue_count)):
+				red, blue, red_turn = index_position(index, red_count, blue_count)
+				board = bytearray(rules.CELLS)
+				for square in squares(red):
+					board[square] = rules.RED
+				for square in squares(blue):
+					board[square] = rules.BLUE
+				state = rules.GameState(board, red_turn)
+
+				after = []
+				for move in list(legacy_moves(state)):
+					state.move(*move)
+					after.append(None if state.winner() else (*from_board(state.board), state.red_turn))
+					state.unmake()
+				moves[red, blue, red_turn] = after or [(red, blue, not red_turn)]
+
+	# A position wins in distance moves if a move leaves the opponent lost in
+	# 	distance - 1, and loses once all of its moves leave the opponent
+	# 	winning, the longest of them in distance - 1. Positions that are never
+	# 	decided are draws.
+	values = {}
+	distance = 0
+	while True:
+		distance += 1
+		decided = {}
+		for position, after in moves.items():
+			if any(values.get(child) == 1 - distance if child else distance == 1 for child in after):
+				decided[position] = distance
+			elif all(child in values and values[child] > 0 for child in after if child):
+				decided[position] = -distance
+		if not decided:
+			break
+		values.update(decided)
+		for position in decided:
+			del moves[position]
+	print(f'Solved {len(values) + len(moves):,} positions with rules.py in {perf_counter() - start:.1f}s')
+
+	# The tables only hold at least as many red pieces as blue ones, and probe
+	# 	swaps the colors for the rest.
+	tablebase = Tablebase(directory)
+	differences = 0
+	for red_count in range(1, pieces + 1):
+		for blue_count in range(1, red_count + 1):
+			if red_count + blue_count > rules.CELLS:
+				continue
+			if tablebase._table(red_count, blue_count) is None:
+				print(f'{red_count}v{blue_count}: not built')
+				continue
+
+			for index in range(table_size(red_count, blue_count)):
+				position = index_position(index, red_count, blue_count)
+				expected = values.get(position, 0)
+				found = tablebase.probe(*position)
+				if found != expected:
+					if not differences:
+						print(f'{red_count}v{blue_count} position {index}: {found} in the table, {expected} by rules.py')
+					differences += 1
+			print(f'{red_count}v{blue_count}: checked {table_size(red_count, blue_count):,} positions')
+	tablebase.close()
+	return differences
+
+
+if __name__ == '__main__':
+	from argparse import ArgumentParser
+
+	parser = ArgumentParser(description='Build Mad Rooks endgame tablebases.')
+	parser.add_argument('directory')
+	parser.add_argument('--pieces', type=int, default=2, help='most pieces a side')
+	parser.add_argument('--workers', type=int, default=cpu_count() or 1)
+	parser.add_argument('--size', type=rules.parse_size, default=(rules.WIDTH, rules.HEIGHT), help='board size, WxH')
+	parser.add_argument('--check', action='store_true', help='solve the tables again with rules.validate_move')
+	args = parser.parse_args()
+
+	rules.set_size(*args.size)
+	build(args.directory, args.pieces, args.workers)
+
+	if args.check:
+		differences = check(args.directory, args.pieces)
+		if differences:
+			print(f'\033[91m{differences:,} positions differ!\033[0m')
+			raise SystemExit(1)
@@ -0,0 +1,129 @@
+# ttable.py
+
+# A fixed-size transposition table for the search in ai.py.
+# All of the memory is allocated up front as two flat arrays of 64-bit words,
+# 	so the table never grows no matter how long the analysis runs. Entries are
+# 	grouped in buckets of two slots:
+# 	- slot 0 is depth-preferred: it is only replaced by a search at least as
+# 		deep, or when it was left over from an earlier search.
+# 	- slot 1 is always-replace: it takes whatever slot 0 would not.
+
+from array import array
+
+# What a stored score means, relative to the search window it came from.
+EMPTY = 0
+EXACT = 1
+LOWER = 2
+UPPER = 3
+
+# Each entry is a 64-bit key plus one 64-bit word packing the rest:
+# 	bits 0-15 move (movegen.encode_move, 0 for none), 16-17 flag, 18-25 depth,
+# 	26-33 search generation and 34 upwards the score, offset to be positive.
+ENTRY_BYTES = 16
+SCORE_OFFSET = 1 << 29
+
+
+class TranspositionTable():
+
+	def __init__(self, megabytes=16):
+		self.megabytes = megabytes
+
+		# Round the number of buckets down to a power of two so the bucket
+		# 	index is a mask of the key.
+		buckets = 1
+		while buckets * 2 * 2 * ENTRY_BYTES <= megabytes * 1024 * 1024:
+			buckets *= 2
+		self.mask = buckets - 1
+
+		self.keys = array('Q', bytes(buckets * 2 * 8))
+		self.data = array('Q', bytes(buckets * 2 * 8))
+		self.generation = 0
+
+		# Counters, for tuning the table size.
+		# A collision is a probe whose bucket was full of other positions.
+		self.probes = 0
+		self.hits = 0
+		self.misses = 0
+		self.collisions = 0
+		self.stores = 0
+		self.overwrites = 0
+
+	# The number of entries the table can hold.
+	def __len__(self):
+		return len(self.keys)
+
+	# Start a new search, so entries from older searches can be replaced.
+	def new_search(self):
+		self.generation = (self.generation + 1) & 0xFF
+
+	# Forget every entry and reset the counters.
+	def clear(self):
+		self.__init__(self.megabytes)
+
+	# Look up a position by its Zobrist hash.
+	# Returns (depth, flag, score, move) or None if the position is not stored.
+	def probe(self, key):
+		self.probes += 1
+		slot = (key & self.mask) << 1
+		keys = self.keys
+
+		if keys[slot] != key:
+			slot += 1
+			if keys[slot] != key:
+				self.misses += 1
+				if self.data[slot - 1] and self.data[slot]:
+					self.collisions += 1
+				return None
+
+		data = self.data[slot]
+		if not data:
+			self.misses += 1
+			return None
+
+		self.hits += 1
+		return (
+			data >> 18 & 0xFF,
+			data >> 16 & 3,
+			(data >> 34) - SCORE_OFFSET,
+			data & 0xFFFF
+		)
+
+	# Store the result of searching a position depth moves deep.
+	# move is the best move found, encoded with movegen.encode_move, or 0.
+	def store(self, key, depth, flag, score, move):
+		self.stores += 1
+		slot = (key & self.mask) << 1
+		keys = self.keys
+		data = self.data
+
+		# Use the depth-preferred slot for the same position, a deeper search
+		# 	or an entry from an earlier search; otherwise the other one.
+		old = data[slot]
+		if not (
+			keys[slot] == key or not old
+			or depth >= (old >> 18 & 0xFF)
+			or (old >> 26 & 0xFF) != self.generation
+		):
+			slot += 1
+			old = data[slot]
+
+		if old and keys[slot] != key:
+			self.overwrites += 1
+
+		keys[slot] = key
+		data[slot] = (
+			(score + SCORE_OFFSET) << 34 | self.generation << 26
+			| min(depth, 0xFF) << 18 | flag << 16 | move
+		)
+
+	# The counters as a dictionary, for printing.
+	def stats(self):
+		return {
+			'entries': len(self),
+			'probes': self.probes,
+			'hits': self.hits,
+			'misses': self.misses,
+			'collisions': self.collisions,
+			'stores': self.stores,
+			'overwrites': self.overwrites,
+		}
@@ -0,0 +1,75 @@
+# zobrist.py
+
+# Zobrist hashing of Mad Rooks positions.
+# Every (color, square) pair and the side to move get a random 64-bit key,
+# 	and a position's hash is the xor of the keys of everything in it. A move
+# 	only changes a few of those, so the hash is updated by xor-ing them in and
+# 	out instead of being recomputed.
+# The keys come from a fixed seed, so hashes are the same in every process and
+# 	can be saved to files. They are drawn again when the board size changes,
+# 	and the 8x8 keys are always the same.
+
+from random import Random
+
+import rules
+from bitboard import squares
+
+SEED = 0x4D6164526F6F6B73
+
+# PIECE_KEYS[color][square], where color is rules.RED or rules.BLUE. The EMPTY
+# 	row is all zeros so a board cell can be used as the index directly.
+# SIDE_KEY is xor-ed in when it is BLUE's turn.
+def _build_keys():
+	rng = Random(SEED)
+	piece_keys = [
+		(0,) * rules.CELLS,
+		tuple(rng.getrandbits(64) for _ in range(rules.CELLS)),
+		tuple(rng.getrandbits(64) for _ in range(rules.CELLS)),
+	]
+	return tuple(piece_keys), rng.getrandbits(64)
+
+
+def _resize():
+	global PIECE_KEYS, SIDE_KEY
+	PIECE_KEYS, SIDE_KEY = _build_keys()
+
+rules.on_resize(_resize)
+
+
+# Hash a rules.py board and the side to move.
+def hash_board(board, red_turn=True):
+	key = 0 if red_turn else SIDE_KEY
+	for index, color in enumerate(board):
+		key ^= PIECE_KEYS[color][index]
+	return key
+
+
+# Hash a rules.GameState.
+def hash_state(state):
+	return hash_board(state.board, state.red_turn)
+
+
+# Hash a position given as bitboards.
+def hash_bits(red, blue, red_turn=True):
+	key = 0 if red_turn else SIDE_KEY
+	red_keys = PIECE_KEYS[rules.RED]
+	blue_keys = PIECE_KEYS[rules.BLUE]
+	for index in squares(red): key ^= red_keys[index]
+	for index in squares(blue): key ^= blue_keys[index]
+	return key
+
+
+# Update a hash for a move by the player with the given color from start to
+# 	end (board indexes), which also passes the turn.
+# killed is whether there was an enemy piece on end.
+def update(key, color, start, end, killed):
+	keys = PIECE_KEYS[color]
+	key ^= keys[start] ^ keys[end] ^ SIDE_KEY
+	if killed:
+		key ^= PIECE_KEYS[rules.opponent(color)][end]
+	return key
+
+
+# Update a hash for a player passing their turn.
+def update_pass(key):
+	return key ^ SIDE_KEY